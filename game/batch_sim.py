@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Headless, vectorized game simulation for bots and RL.
+
+BatchEnv holds N independent games in NumPy arrays and advances all of them
+with one step(moves) call, following the same rules as
+game_logic.move_player: walls and enemies block, doors need their key and
+stay open once unlocked, keys are picked up, stairs move you to the
+matching '@' on the target floor, and '^' on the final floor completes the
+game.
+
+The campaign (every level_N.txt) is compiled once into padded tile arrays,
+so a step is a handful of array lookups with no per-game Python code.
+
+    python batch_sim.py               # check against move_player, then benchmark
+    python batch_sim.py --bench 8192  # benchmark with 8192 games
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import game_state as GS
+import game_logic
+from game import make_grid, level_path_for
+from game_logic import FINAL_FLOOR
+
+# Tile kinds
+FLOOR, WALL, DOOR, KEY, UP, DOWN = range(6)
+
+# Move codes: same order as the client's w/a/s/d keys; -1 = no move
+MOVES = "wasd"
+DX = np.array([0, -1, 0, 1], dtype=np.int32)
+DY = np.array([-1, 0, 1, 0], dtype=np.int32)
+
+
+class Campaign:
+    """
+    Static tile data for every floor, padded to a common size with a
+    one-tile wall border so moves never need a bounds check.
+    Arrays are indexed [floor, y + 1, x + 1].
+    """
+
+    def __init__(self):
+        levels = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            while os.path.exists(level_path_for(f"level_{len(levels)}.txt")):
+                levels.append(make_grid(f"level_{len(levels)}.txt"))
+        if not levels:
+            raise FileNotFoundError("no level_N.txt files found")
+
+        F = len(levels)
+        H = max(lv[1] for lv in levels) + 2
+        W = max(lv[0] for lv in levels) + 2
+        self.n_floors = F
+        self.start = (0, *levels[0][5])     # (floor, x, y) like initialize_game
+
+        self.kind = np.full((F, H, W), WALL, dtype=np.uint8)
+        self.special = np.full((F, H, W), -1, dtype=np.int32)   # door/key index
+        self.keybit = np.zeros((F, H, W), dtype=np.uint64)
+        self.dest = np.zeros((3, F, H, W), dtype=np.int32)      # stair target floor, x, y
+
+        key_ids = sorted({vg[y][x][1] for w, h, vg, ct, grid, pos in levels
+                          for y in range(h) for x in range(w)
+                          if grid[y][x][:1] in ("=", "<")})
+        if len(key_ids) > 64:
+            raise ValueError("more than 64 distinct key ids")
+        self.key_bits = {k: np.uint64(1) << np.uint64(i) for i, k in enumerate(key_ids)}
+
+        n_special = 0
+        for f, (w, h, vg, ct, grid, pos) in enumerate(levels):
+            for y in range(h):
+                for x in range(w):
+                    ch = grid[y][x][:1]
+                    val = vg[y][x][1] if isinstance(vg[y][x], (list, tuple)) else None
+                    k = FLOOR
+                    if ch in game_logic.basic_solid:
+                        k = WALL
+                    elif ch in ("=", "<"):
+                        k = DOOR if ch == "=" else KEY
+                        self.special[f, y + 1, x + 1] = n_special
+                        self.keybit[f, y + 1, x + 1] = self.key_bits[val]
+                        n_special += 1
+                    elif ch in ("^", "v"):
+                        k = UP if ch == "^" else DOWN
+                        if not (ch == "^" and f == FINAL_FLOOR) and not (ch == "v" and f == 0):
+                            tf = val // 100
+                            if tf >= F:
+                                raise ValueError(f"stair at floor {f} ({x},{y}) leads to missing level {tf}")
+                            self.dest[:, f, y + 1, x + 1] = (tf, *arrival(levels[tf], val % 100))
+                    self.kind[f, y + 1, x + 1] = k
+        self.n_special = n_special
+
+
+def arrival(level, code):
+    """Where load_level puts the player for a stair code: first matching '@', else the level start."""
+    w, h, vg, ct, grid, pos = level
+    for y in range(h):
+        for x in range(w):
+            cell = vg[y][x]
+            if isinstance(cell, (list, tuple)) and len(cell) > 1 and cell[0] == 13 and int(cell[1]) == code:
+                return x, y
+    return pos
+
+
+class BatchEnv:
+    def __init__(self, n, campaign=None):
+        self.n = n
+        self.campaign = campaign or Campaign()
+        self._rows = np.arange(n)
+        self.floor = np.zeros(n, dtype=np.int32)
+        self.x = np.zeros(n, dtype=np.int32)
+        self.y = np.zeros(n, dtype=np.int32)
+        self.keys = np.zeros(n, dtype=np.uint64)
+        self.opened = np.zeros((n, max(1, self.campaign.n_special)), dtype=bool)  # doors/keys used up
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Restart the games selected by mask (all of them by default)."""
+        mask = slice(None) if mask is None else mask
+        f, x, y = self.campaign.start
+        self.floor[mask] = f
+        self.x[mask] = x
+        self.y[mask] = y
+        self.keys[mask] = 0
+        self.opened[mask] = False
+        self.done[mask] = False
+
+    def step(self, moves):
+        """
+        Apply one move per game. moves is an int array of codes into MOVES
+        ("wasd"), -1 for no move. Finished games ignore their moves.
+        Returns the done array.
+        """
+        c = self.campaign
+        moves = np.asarray(moves)
+        active = (moves >= 0) & ~self.done
+        m = np.where(active, moves, 0)
+        nx = self.x + DX[m]
+        ny = self.y + DY[m]
+        f = self.floor
+        idx = (f, ny + 1, nx + 1)
+
+        kind = c.kind[idx]
+        special = c.special[idx]
+        has_special = special >= 0
+        used = has_special & self.opened[self._rows, np.maximum(special, 0)]
+        kind = np.where(used, FLOOR, kind)
+        need = c.keybit[idx]
+
+        door_open = (kind == DOOR) & ((self.keys & need) != 0)
+        key = kind == KEY
+        up = kind == UP
+        stair = (up & (f != FINAL_FLOOR)) | ((kind == DOWN) & (f > 0))
+        finish = up & (f == FINAL_FLOOR)
+        walk = (kind == FLOOR) | door_open | key
+
+        take = active & (door_open | key)
+        self.opened[self._rows[take], special[take]] = True
+        self.keys |= np.where(active & key, need, np.uint64(0))
+
+        walk &= active
+        self.x = np.where(walk, nx, self.x)
+        self.y = np.where(walk, ny, self.y)
+
+        stair &= active
+        if stair.any():
+            self.floor = np.where(stair, c.dest[0][idx], self.floor)
+            self.x = np.where(stair, c.dest[1][idx], self.x)
+            self.y = np.where(stair, c.dest[2][idx], self.y)
+
+        self.done |= active & finish
+        return self.done
+
+
+# ============================================================
+#  EQUIVALENCE CHECK AGAINST move_player
+# ============================================================
+def verify(trials=300, steps=1000, seed=0):
+    """
+    Random walks from random floors, positions and key sets, run through
+    both move_player and BatchEnv (one game per trial). Raises on the first
+    step where they disagree.
+    """
+    rng = random.Random(seed)
+    camp = Campaign()
+    env = BatchEnv(trials, camp)
+    key_ids = list(camp.key_bits)
+
+    starts = []
+    for i in range(trials):
+        f = rng.randrange(camp.n_floors)
+        cells = np.argwhere(camp.kind[f] == FLOOR)
+        y, x = cells[rng.randrange(len(cells))] - 1
+        keys = {k for k in key_ids if rng.random() < 0.5}
+        starts.append((f, int(x), int(y), keys))
+        env.floor[i], env.x[i], env.y[i] = f, x, y
+        env.keys[i] = sum((camp.key_bits[k] for k in keys), np.uint64(0))
+    plans = [[rng.randrange(4) for _ in range(steps)] for _ in range(trials)]
+
+    # Reference: each trial as its own game through move_player
+    expected = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for f, x, y, keys in starts:
+            game_logic.reset()
+            GS.game_complete = False
+            game_logic.load_level(f)
+            GS.player_pos = (x, y)
+            game_logic.collectedKeys.update(keys)
+            trace = []
+            for mv in plans[len(expected)]:
+                if GS.game_complete:
+                    break
+                pos = game_logic.move_player(MOVES[mv])
+                trace.append((GS.floor, tuple(pos), GS.game_complete))
+            expected.append(trace)
+
+    for t in range(steps):
+        env.step(np.array([p[t] for p in plans]))
+        for i, trace in enumerate(expected):
+            if t < len(trace):
+                got = (int(env.floor[i]), (int(env.x[i]), int(env.y[i])), bool(env.done[i]))
+                if got != trace[t]:
+                    raise AssertionError(f"trial {i} step {t}: move_player {trace[t]} != batch {got}")
+    floors_changed = sum(any(s[0] != starts[i][0] for s in tr) for i, tr in enumerate(expected))
+    return trials, steps, floors_changed
+
+
+def benchmark(n, steps=1000, seed=0):
+    env = BatchEnv(n)
+    rng = np.random.default_rng(seed)
+    moves = rng.integers(0, 4, size=(steps, n))
+    start = time.perf_counter()
+    for t in range(steps):
+        env.step(moves[t])
+    elapsed = time.perf_counter() - start
+    return n * steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", type=int, default=4096, help="number of games to benchmark")
+    parser.add_argument("--no-verify", action="store_true", help="skip the move_player equivalence check")
+    args = parser.parse_args()
+
+    if not args.no_verify:
+        trials, steps, floors_changed = verify()
+        print(f"✓ matches move_player on {trials} random walks x {steps} steps "
+              f"({floors_changed} took stairs)")
+    print(f"{benchmark(args.bench):,.0f} steps/sec with {args.bench} games")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Build smaller variants of the big images in assets/ and a manifest of them.
+
+    assets/backgrounds/*.png -> WebP and 256-colour PNG at BACKGROUND_WIDTHS
+    assets/map/*.svg         -> minified SVG, and PNGs at MAP_WIDTHS
+
+Everything goes to assets/build/ along with manifest.json. server.py reads
+the manifest and the page templates use it (templates/_backgrounds.html)
+to serve the smallest variant that still covers the screen; without a
+manifest the pages keep using the original files.
+
+Pillow is needed for the raster variants, and cairosvg or rsvg-convert
+(librsvg) for rasterizing the maps. Missing tools only skip their step.
+
+    python build_assets.py           # build what is out of date
+    python build_assets.py --force   # rebuild everything
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # OSError: the cairo library itself is missing
+    cairosvg = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+BUILD_DIR = os.path.join(ASSETS_DIR, "build")
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+
+BACKGROUND_WIDTHS = (640, 1024, 1536)   # never above the source width
+MAP_WIDTHS = (512, 1024)
+WEBP_QUALITY = 80
+DENSITIES = (1, 1.5, 2)                 # device pixel ratios the background rules cover
+PNG_COLOURS = 256
+
+# Attributes holding coordinates: their numbers are rounded to 2 decimals
+GEOMETRY_ATTRS = {"d", "points", "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry",
+                  "width", "height", "transform", "viewBox", "stroke-width"}
+
+
+def out_of_date(src, dst, force=False):
+    return force or not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(src)
+
+
+def variant(path, kind, width=None, height=None):
+    """Manifest entry for a built file (path relative to assets/)."""
+    entry = {"path": os.path.relpath(path, ASSETS_DIR).replace(os.sep, "/"), "type": kind,
+             "bytes": os.path.getsize(path)}
+    if width:
+        entry["width"] = width
+    if height:
+        entry["height"] = height
+    return entry
+
+
+def save_atomic(path, write):
+    """write(tmp_path), then move it into place, so a half-built file is never served."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_text(text):
+    """A save_atomic writer for text."""
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return write
+
+
+# --- Backgrounds ---
+def build_background(src, force=False):
+    """WebP and quantized PNG of src at each width. Returns manifest variants."""
+    name = os.path.splitext(os.path.basename(src))[0]
+    out_dir = os.path.join(BUILD_DIR, "backgrounds")
+    with Image.open(src) as im:
+        im = im.convert("RGB")
+        widths = sorted({w for w in BACKGROUND_WIDTHS if w < im.width} | {im.width})
+        variants = []
+        for w in widths:
+            webp = os.path.join(out_dir, f"{name}-{w}.webp")
+            png = os.path.join(out_dir, f"{name}-{w}.png")
+            h = round(im.height * w / im.width)
+            if out_of_date(src, webp, force) or out_of_date(src, png, force):
+                scaled = im if w == im.width else im.resize((w, h), Image.LANCZOS)
+                save_atomic(webp, lambda p: scaled.save(p, "WEBP", quality=WEBP_QUALITY, method=6))
+                quantized = scaled.quantize(PNG_COLOURS, method=Image.Quantize.MEDIANCUT)
+                save_atomic(png, lambda p: quantized.save(p, "PNG", optimize=True))
+            variants += [variant(webp, "image/webp", w, h), variant(png, "image/png", w, h)]
+    return variants
+
+
+# --- SVG maps ---
+def round_numbers(value):
+    def repl(m):
+        text = f"{float(m.group(0)):.2f}".rstrip("0").rstrip(".")
+        if text in ("-0", ""):
+            text = "0"
+        # "1.999.5" is two numbers: keep a point so "2" does not swallow ".5"
+        if "." not in text and m.string[m.end():m.end() + 1] == ".":
+            text += ".0"
+        return text
+    return re.sub(r"-?\d*\.\d{3,}", repl, value)
+
+
+def minify_svg(text):
+    """Drop comments and layout whitespace, round coordinates to 2 decimals."""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+
+    def attr(m):
+        name, value = m.group(1), " ".join(m.group(2).split())
+        if name in GEOMETRY_ATTRS:
+            value = round_numbers(value)
+        return f' {name}="{value}"'
+    text = re.sub(r'\s+([\w:-]+)="([^"]*)"', attr, text)
+
+    def style(m):
+        css = " ".join(m.group(2).split())
+        css = re.sub(r"\s*([{}:;,])\s*", r"\1", css).replace(";}", "}")
+        return m.group(1) + css + m.group(3)
+    text = re.sub(r"(<style[^>]*>)(.*?)(</style>)", style, text, flags=re.S)
+
+    # Whitespace between tags only matters inside <text>
+    parts = re.split(r"(<text\b.*?</text>)", text, flags=re.S)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r">\s+<", "><", parts[i])
+    return "".join(parts).strip() + "\n"
+
+
+def rasterize(svg_path, png_path, width):
+    """PNG of svg_path width pixels wide. Returns False if no rasterizer is available."""
+    if cairosvg is not None:
+        save_atomic(png_path, lambda p: cairosvg.svg2png(url=svg_path, write_to=p, output_width=width))
+    elif shutil.which("rsvg-convert"):
+        save_atomic(png_path, lambda p: subprocess.run(
+            ["rsvg-convert", "-w", str(width), "-o", p, svg_path], check=True))
+    else:
+        return False
+    if Image is not None:
+        with Image.open(png_path) as im:
+            im.load()
+        save_atomic(png_path, lambda p: im.save(p, "PNG", optimize=True))
+    return True
+
+
+def build_map(src, force=False):
+    """Minified SVG and PNGs of src. Returns manifest variants."""
+    name = os.path.splitext(os.path.basename(src))[0]
+    out_dir = os.path.join(BUILD_DIR, "map")
+    svg = os.path.join(out_dir, f"{name}.min.svg")
+    if out_of_date(src, svg, force):
+        with open(src, "r", encoding="utf-8") as f:
+            text = minify_svg(f.read())
+        save_atomic(svg, write_text(text))
+    variants = [variant(svg, "image/svg+xml")]
+    for w in MAP_WIDTHS:
+        png = os.path.join(out_dir, f"{name}-{w}.png")
+        if out_of_date(src, png, force) and not rasterize(svg, png, w):
+            print(f"  {name}: no cairosvg or rsvg-convert, PNGs skipped")
+            break
+        variants.append(variant(png, "image/png", w))
+    return variants
+
+
+def build(force=False):
+    manifest = {}
+    jobs = [("backgrounds/*.png", build_background, Image is not None, "Pillow is not installed"),
+            ("map/*.svg", build_map, True, "")]
+    for pattern, builder, available, reason in jobs:
+        for src in sorted(glob.glob(os.path.join(ASSETS_DIR, pattern))):
+            key = os.path.relpath(src, ASSETS_DIR).replace(os.sep, "/")
+            if not available:
+                print(f"- {key}: skipped ({reason})")
+                continue
+            start = time.perf_counter()
+            variants = builder(src, force)
+            size = os.path.getsize(src)
+            smallest = min(v["bytes"] for v in variants)
+            manifest[key] = {"bytes": size, "variants": variants}
+            print(f"✓ {key}: {size / 1024:,.0f} KB -> {len(variants)} variants, smallest "
+                  f"{smallest / 1024:,.0f} KB ({time.perf_counter() - start:.1f}s)")
+    save_atomic(MANIFEST_PATH, write_text(json.dumps(manifest, indent=1)))
+    return manifest
+
+
+# --- Reading the manifest (server.py / templates) ---
+def load_manifest(path=MANIFEST_PATH):
+    """The built manifest, or {} if build_assets.py has not been run."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(manifest, name, kind=None, width=None):
+    """
+    URL of the best built variant of assets/name: of type kind if given, the
+    narrowest at least width pixels wide (or the widest). The original if
+    nothing was built.
+    """
+    variants = [v for v in manifest.get(name, {}).get("variants", []) if kind in (None, v["type"])]
+    if width:
+        wide = [v for v in variants if v.get("width", 0) >= width]
+        variants = sorted(wide, key=lambda v: v["width"])[:1] or sorted(variants, key=lambda v: -v.get("width", 0))
+    return "/assets/" + (variants[0]["path"] if variants else name)
+
+
+def background_css(manifest, selector, name):
+    """
+    CSS giving selector the background assets/name (WebP where supported)
+    at the smallest size that covers the viewport. The pages use
+    background-size: cover, so a variant only covers a viewport that fits
+    inside it in both width and height at the screen's pixel density.
+    "" if not built.
+    """
+    by_size = {}
+    for v in manifest.get(name, {}).get("variants", []):
+        by_size.setdefault((v["width"], v.get("height")), {})[v["type"]] = "/assets/" + v["path"]
+    rules = []
+    for i, (w, h) in enumerate(sorted(by_size, reverse=True)):
+        urls = by_size[(w, h)]
+        decl = (f'background-image: url("{urls["image/png"]}"); '
+                f'background-image: image-set(url("{urls["image/webp"]}") type("image/webp"), '
+                f'url("{urls["image/png"]}") type("image/png"));')
+        if i == 0:
+            rules.append(f"{selector} {{ {decl} }}")
+        elif h:  # manifests from before heights were recorded only get the largest
+            # Later (smaller) rules win while they still cover the screen
+            query = ", ".join(f"(max-resolution: {d}dppx) and (max-width: {int(w / d)}px) "
+                              f"and (max-height: {int(h / d)}px)" for d in DENSITIES)
+            rules.append(f"@media {query} {{ {selector} {{ {decl} }} }}")
+    return "\n".join(rules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    args = parser.parse_args()
+    manifest = build(args.force)
+    before = sum(e["bytes"] for e in manifest.values())
+    after = sum(min(v["bytes"] for v in e["variants"]) for e in manifest.values())
+    print(f"{len(manifest)} assets in {os.path.relpath(MANIFEST_PATH, BASE_DIR)}: "
+          f"{before / 1024:,.0f} KB of originals, {after / 1024:,.0f} KB for the smallest variants")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,163 @@
-
-basic_tiles = { #ints are only used for the special code
-    "-":[0,-2],  #empty Space
-    "#":[1,-1],  #wall
-    " ":[2,-1],  #basic floor
-    "*":[3, -2], #player
-    "=":[9,-1],  #door, disappears if they have the key for it
-    "<":[8,-1],  #keycard for the door
-    "?":[7,-1],  #special interactable, do a function call
-    "E":[0,-1],  #enemy type
-    "^":[11,-1],  #staircase up
-    "v":[12,-1],  #staircase down
-    "@":[13,-1],  #starts from staircases
-    "c":[21,-1],  #chest, refers to chest table
-    "p":[22,-1]  #powerup
-}
-
-#  '#' 0 = concrete   1 = wood
-#  ' ' 0 = concrete   1 = wood    2 = carpet   3 = tile
-#  for staircases - -x-y x = level y = door  0001
-#  each staircase must have a corresponding start on the given level
-#        00 01 staircase, floor 00, there must be a start 01
-
 """
 Used to change the second tuple value:
 tile_type = tile[0]
 tile_number = int(tile[1:])
 """
 import os
-import re
+from collections import namedtuple
+import numpy as np
+import tracing
+from level_format import basic_tiles, decode_tiles, parse_header_value  # tile codes and file format
 
-def decode_tiles(line):
-    pattern = r".\d*"     # one character, followed by zero or more digits
-    return re.findall(pattern, line.strip())
+# Set PRINT_LEVELS=1 to dump each loaded level to stdout
+PRINT_LEVELS = os.environ.get("PRINT_LEVELS") == "1"
 
-def make_grid(levelFile):
-    grid = []
-    valueGrid = []
-    chestTable = []
+# --- Parsed level cache ---
+# level path -> ParsedLevel with rows as tuples of tile tokens. Filled on
+# first use, or ahead of time by prefetch_level from a worker thread, so
+# make_grid does no disk I/O for a level it has seen. Entries are never
+# mutated, only replaced (see level_watch.py), so readers need no lock.
+# replacementFloors is derived tile data, computed once per read.
+ParsedLevel = namedtuple("ParsedLevel", "width height rows chestRows lines mtime replacementFloors")
+LEVEL_CACHE = {}
 
-    # --- FIX PATH ---
+def level_path_for(levelFile):
     # Level files are in ../assets/levels relative to game.py
     script_dir = os.path.dirname(os.path.abspath(__file__))
     level_path = os.path.join(script_dir, "..", "assets", "levels", levelFile)
-    level_path = os.path.normpath(level_path)  # clean up any ../
+    return os.path.normpath(level_path)  # clean up any ../
 
+@tracing.traced()
+def read_level(level_path, previous=None):
+    """
+    Read and tokenize a level file (the disk I/O and regex parsing).
+    With previous (the ParsedLevel it replaces), lines that did not change
+    reuse their old tokens and only edited rows are decoded again.
+    """
     if not os.path.exists(level_path):
         raise FileNotFoundError(f"Level file not found at {level_path}")
 
-    # --- Read level file ---
-    with open(level_path, "r") as f:
-        lineNum = 0
-        width_line = f.readline().strip()
-        height_line = f.readline().strip()
-
-        width = int(width_line.split("=")[1])
-        height = int(height_line.split("=")[1])
-        for line in f:
-            if lineNum < height:
-                txtLine = line.strip()
-                grid.append(decode_tiles(txtLine))
+    with tracing.span("read_level_file", file=os.path.basename(level_path)):
+        mtime = os.stat(level_path).st_mtime_ns  # before reading, so a racing write is seen next time
+        with open(level_path, "r") as f:
+            width_line = f.readline()
+            height_line = f.readline()
+            lines = tuple(line.rstrip("\r\n") for line in f)
+
+    width = parse_header_value(width_line, "width")
+    height = parse_header_value(height_line, "height")
+    if width is None or height is None:
+        raise ValueError(f"{os.path.basename(level_path)}: missing width/height header")
+    old_lines = previous.lines if previous else ()
+    old_tokens = previous.rows + previous.chestRows if previous else ()
+    tokens = []
+    with tracing.span("decode_tiles", rows=len(lines)):
+        for lineNum, txtLine in enumerate(lines):
+            if lineNum < len(old_lines) and old_lines[lineNum] == txtLine:
+                tokens.append(old_tokens[lineNum])
             else:
-                txtLine = line.strip()
-                chestTable.append(decode_tiles(txtLine))
-            lineNum += 1
+                tokens.append(tuple(decode_tiles(txtLine)))
+    rows = tuple(tokens[:height])
+    with tracing.span("replacement_floors"):
+        floors = replacement_floors(width, height, rows)
+    return ParsedLevel(width, height, rows, tuple(tokens[height:]), lines, mtime, floors)
+
+# Neighbour order decides ties between equally common floor subtypes
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+NO_FLOOR = np.iinfo(np.int64).min
+
+def replacement_floors(width, height, rows):
+    """
+    (x, y) -> floor subtype for every door, key and roomba spawn: the
+    subtype most common among its floor neighbours (the first one seen wins
+    a tie), or 0 with no floor neighbour. Done for the whole level in one
+    numpy pass so opening a door or taking a key is a dict lookup.
+    """
+    # Floor subtypes with a border of NO_FLOOR, as make_grid sees them: the
+    # player marker (or the fallback tile) becomes a floor without a subtype
+    sub = np.full((height + 2, width + 2), NO_FLOOR, dtype=np.int64)
+    special = np.zeros((height, width), dtype=bool)
+    has_player = False
+    for y, row in enumerate(rows):
+        for x, tile in enumerate(row[:width]):
+            ch = tile[0]
+            if ch == " ":
+                sub[y + 1, x + 1] = int(tile[1:])
+            elif ch == "*":
+                sub[y + 1, x + 1] = -1
+                has_player = True
+            elif ch == "=" or ch == "<" or ch == "E":
+                special[y, x] = True
+    if not has_player and height > 1 and width > 1:
+        sub[2, 2] = -1
+        special[1, 1] = False
+
+    values = np.stack([sub[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] for dx, dy in NEIGHBOURS])
+    valid = values != NO_FLOOR
+    # counts[k] = how many neighbours share neighbour k's subtype; argmax takes the first best
+    counts = ((values[:, None] == values[None, :]) & valid[None, :]).sum(axis=1) * valid
+    best = np.take_along_axis(values, counts.argmax(axis=0)[None], axis=0)[0]
+    result = np.where(counts.max(axis=0) > 0, best, 0)
+
+    ys, xs = np.nonzero(special)
+    return {(int(x), int(y)): int(result[y, x]) for y, x in zip(ys, xs)}
+
+def get_level(levelFile):
+    level_path = level_path_for(levelFile)
+    level = LEVEL_CACHE.get(level_path)
+    if level is None:
+        level = read_level(level_path)
+        LEVEL_CACHE[level_path] = level
+    return level
+
+def is_level_cached(levelFile):
+    return level_path_for(levelFile) in LEVEL_CACHE
+
+def prefetch_level(levelFile):
+    """Parse levelFile into LEVEL_CACHE ahead of time. Safe to run in a worker thread."""
+    get_level(levelFile)
+
+@tracing.traced()
+def make_grid(levelFile):
+    width, height, rows, chestRows = get_level(levelFile)[:4]
+    # Copy out of the cache: callers mutate grid (doors, keys, player marker)
+    grid = [list(row) for row in rows]
+    chestTable = [list(row) for row in chestRows]
+    valueGrid = []
 
     # --- Build valueGrid ---
-    for y in range(height):
-        tmpgrid = []
-        for x in range(width):
-            tile = grid[y][x]
-            key = tile[0]
-            if key not in basic_tiles:
-                tmpgrid.append((-1,-1))
-                continue
-            tile_values = basic_tiles[tile[0]][:]
-            if tile_values[1] == -1:
-                tile_values[1] = int(tile[1:])
-            tmpgrid.append(tile_values)
-        valueGrid.append(tmpgrid)
-
-    for y in range(height):
-        for x in range(width):
-            print(grid[y][x][0], end = '')
-        print()
+    with tracing.span("build_value_grid"):
+        for y in range(height):
+            tmpgrid = []
+            for x in range(width):
+                tile = grid[y][x]
+                key = tile[0]
+                if key not in basic_tiles:
+                    tmpgrid.append((-1,-1))
+                    continue
+                tile_values = basic_tiles[tile[0]][:]
+                if tile_values[1] == -1:
+                    tile_values[1] = int(tile[1:])
+                tmpgrid.append(tile_values)
+            valueGrid.append(tmpgrid)
+
+    if PRINT_LEVELS:
+        print("\n".join("".join(tile[0] for tile in row) for row in grid))
 
     # --- Find player position ---
-    player_pos = None
-    for y in range(height):
-        for x in range(width):
-            if grid[y][x][0] == "*":
-                player_pos = (x, y)
-                # Replace the player marker with a floor tile so the sprite is drawn on top
-                grid[y][x] = " "
-                valueGrid[y][x] = basic_tiles[" "][:]
-    if player_pos is None:
-        # fallback
-        player_pos = (28, 4)
-        grid[1][1] = " "
-        valueGrid[1][1] = basic_tiles[" "][:]
+    with tracing.span("find_player"):
+        player_pos = None
+        for y in range(height):
+            for x in range(width):
+                if grid[y][x][0] == "*":
+                    player_pos = (x, y)
+                    # Replace the player marker with a floor tile so the sprite is drawn on top
+                    grid[y][x] = " "
+                    valueGrid[y][x] = basic_tiles[" "][:]
+        if player_pos is None:
+            # fallback
+            player_pos = (28, 4)
+            grid[1][1] = " "
+            valueGrid[1][1] = basic_tiles[" "][:]
 
     return width, height, valueGrid, chestTable, grid, player_pos
\ No newline at end of file
@@ -4,13 +4,18 @@ import time
 import math
 import termios
 import tty
+from collections import namedtuple
 import game_state as GS
-from game import make_grid
+import metrics
+import tracing
+from game import make_grid, get_level, is_level_cached
+from spatial import SpatialHash
 
 # ============================================================
 #  MODULE-LOCAL RUNTIME STATE
 # ============================================================
 NIGHT_DURATION = 10
+FINAL_FLOOR = 6     # '^' on this floor ends the game
 NIGHT = 1
 FLOOR_TIMER = 90
 
@@ -22,16 +27,20 @@ collectedKeys = set()     # set of key ids collected
 # collectedKeys.add(2)
 # collectedKeys.add(9)
 gridChanges = []          # list of (floor, x, y, state0, state1)
-enemyStates = []          # placeholder for enemy instances/state
+enemyStates = {}          # floor -> SpatialHash of Roombas on it
+preparedFloors = {}       # floor -> PreparedFloor built ahead of time near a stair
 
 # ============================================================
 #  BASIC ENEMY CLASS (kept simple)
 # ============================================================
 class Roomba:
-    def __init__(self, hp=3, attack=1, movement=1):
+    def __init__(self, hp=3, attack=1, movement=1, x=0, y=0):
         self.hp = hp
         self.attack = attack
         self.movement = movement
+        self.x = x
+        self.y = y
+        self.under = " "   # tile the roomba is standing on
 
     def do_attack(self):
         global PLAYER_HEALTH
@@ -46,8 +55,10 @@ class Roomba:
 # ============================================================
 #  HELPERS / CONFIG
 # ============================================================
-basic_solid = {"#", "E"}   # cannot walk through
+basic_solid = {"#", "E"}   # cannot walk through (offline tools treat roombas as walls)
+walls = {"#"}              # move_player asks the enemy index about "E"
 pass_through = {"-", " ", "<", "?", "c", "p", "^", "v", "="}
+MOVE_OFFSETS = {"w": (0,-1), "s": (0,1), "a": (-1,0), "d": (1,0)}
 
 def display_countdown(t):
     print(f"Time: {max(0, NIGHT_DURATION - t)} s")
@@ -60,38 +71,64 @@ def reset():
     collectedKeys.clear()
     gridChanges.clear()
     enemyStates.clear()
+    preparedFloors.clear()
+
+def start_game(levelFile):
+    """Put GS and the runtime state at the start of a new game on levelFile."""
+    GS.w, GS.h, GS.value_grid, GS.ct, GS.grid, GS.player_pos = make_grid(levelFile)
+    GS.replacement_floors = get_level(levelFile).replacementFloors
+    GS.floor = 0
+    GS.message = None
+    GS.game_complete = False
+    GS.night = False
+    reset() # Resets collected keys and grid changes (doors)
+    sync_enemies(GS.floor)
+
+def state_summary():
+    """Small JSON-able summary of the current game, used to check replays."""
+    return {
+        "floor": GS.floor,
+        "player": list(GS.player_pos),
+        "keys": sorted(collectedKeys, key=str),
+        "game_complete": GS.game_complete,
+    }
 
 # ============================================================
-#  ADJACENT FLOOR TILE RESOLUTION (uses GS.value_grid)
+#  ENEMIES (per-floor spatial index)
 # ============================================================
-from collections import Counter
+def spawn_floor(x, y):
+    """Floor tile under the roomba spawn on (x, y) of the current floor."""
+    return f" {GS.replacement_floors.get((x, y), 0)}"
 
-def getAdjacentFloorTile(x, y):
+def sync_enemies(floor):
     """
-    Return the cell[1] value that is most common among the four cardinal neighbors.
-    Only return it if the associated cell[0] is 2, otherwise return 0.
+    Spawn a Roomba on every "E" of the floor the first time it is loaded.
+    On later loads put the floor's roombas back where they were, since the
+    freshly built grid has them on their spawn tiles.
     """
-    neighbors = [(1,0), (-1,0), (0,1), (0,-1)]
-    values = []
-
-    for dx, dy in neighbors:
-        nx, ny = x + dx, y + dy
-        if 0 <= ny < GS.h and 0 <= nx < GS.w:
-            cell = GS.value_grid[ny][nx]
-            if isinstance(cell, (list, tuple)) and len(cell) > 1:
-                if int(cell[0]) == 2:
-                    values.append(cell[1])
-            elif isinstance(cell, dict):
-                if int(cell.get("floor", 0)) == 2:
-                    values.append(cell.get("subtile", 0))  # or whatever corresponds to cell[1]
-
-    if not values:
-        return 0
-
-    most_common_value = Counter(values).most_common(1)[0][0]
-    GS.grid[y][x] = " "
-    return most_common_value
-
+    index = enemyStates.get(floor)
+    if index is None:
+        index = enemyStates[floor] = SpatialHash()
+        for y in range(GS.h):
+            for x in range(GS.w):
+                if GS.grid[y][x][:1] == "E":
+                    enemy = Roomba(x=x, y=y)
+                    enemy.under = spawn_floor(x, y)
+                    index.add(enemy, x, y)
+        return index
+    for y in range(GS.h):
+        for x in range(GS.w):
+            if GS.grid[y][x][:1] == "E":
+                GS.grid[y][x] = spawn_floor(x, y)
+    for enemy in index:
+        enemy.under = GS.grid[enemy.y][enemy.x]
+        GS.grid[enemy.y][enemy.x] = "E"
+    return index
+
+def enemy_at(x, y):
+    """The Roomba on (x, y) of the current floor, or None."""
+    index = enemyStates.get(GS.floor)
+    return index.at(x, y) if index is not None else None
 
 # ============================================================
 #  GRID CHANGE PERSISTENCE
@@ -129,10 +166,58 @@ def add_gridchange(floor, x, y, state0, state1):
 # ============================================================
 #  LEVEL LOADING
 # ============================================================
+# Everything load_level needs for a floor, built from the cached level
+# and the floor's recorded door/key changes without touching GS, so it can
+# be made in a worker thread before the player reaches the stairs.
+PreparedFloor = namedtuple("PreparedFloor", "level changes w h vg ct grid player_pos arrivals")
+
+def floor_changes(floor):
+    """The recorded door/key changes of floor, in order."""
+    return tuple(rec for rec in gridChanges if rec[0] == floor)
+
+@tracing.traced()
+def build_floor(nf, changes):
+    """PreparedFloor for level nf with changes (from floor_changes) applied."""
+    fname = f"level_{nf}.txt"
+    level = get_level(fname)
+    w, h, vg, ct, grid, player_pos = make_grid(fname)
+
+    # apply recorded changes for this floor
+    with tracing.span("apply_grid_changes"):
+        for _, gx, gy, s0, s1 in changes:
+            try:
+                if 0 <= gy < h and 0 <= gx < w:
+                    # ensure underlying structure is list-like
+                    if isinstance(vg[gy][gx], (list, tuple)):
+                        vg[gy][gx][0] = s0
+                        vg[gy][gx][1] = s1
+                    else:
+                        vg[gy][gx] = [s0, s1]
+                    try:
+                        grid[gy][gx] = ct[s0]
+                    except Exception:
+                        grid[gy][gx] = " "
+            except Exception:
+                pass
+
+    # arrival points by stair code (the first one wins, as in row order)
+    with tracing.span("start_search"):
+        arrivals = {}
+        for y in range(h):
+            for x in range(w):
+                cell = vg[y][x]
+                if isinstance(cell, (list, tuple)) and len(cell) > 1 and cell[0] == 13:
+                    arrivals.setdefault(int(cell[1]), (x, y))
+
+    return PreparedFloor(level, changes, w, h, vg, ct, grid, player_pos, arrivals)
+
+@metrics.timed(metrics.load_level_time)
+@tracing.traced()
 def load_level(new_floor, start_pos=None):
     """
     Load a level into GS.* and apply saved gridChanges for that floor.
-    new_floor may be int or string convertible to int.
+    new_floor may be int or string convertible to int. A floor prepared
+    ahead of time (preparedFloors) is swapped in as is while it is current.
     """
     try:
         nf = int(new_floor)
@@ -141,55 +226,39 @@ def load_level(new_floor, start_pos=None):
         return False
 
     fname = f"level_{nf}.txt"
+    changes = floor_changes(nf)
+    prepared = preparedFloors.pop(nf, None)
     try:
-        w, h, vg, ct, grid, player_pos = make_grid(fname)
+        # Stale if the file was reloaded or the floor changed since it was built
+        if prepared is None or prepared.level is not get_level(fname) or prepared.changes != changes:
+            prepared = build_floor(nf, changes)
+            metrics.floor_loads.inc()
+        else:
+            metrics.floor_loads_prepared.inc()
     except Exception as e:
         print(f"[load_level] make_grid failed for {fname}: {e}")
         return False
 
-    GS.w = w
-    GS.h = h
-    GS.value_grid = vg
-    GS.ct = ct
-    GS.grid = grid
+    GS.w = prepared.w
+    GS.h = prepared.h
+    GS.value_grid = prepared.vg
+    GS.ct = prepared.ct
+    GS.grid = prepared.grid
+    GS.replacement_floors = prepared.level.replacementFloors
     if start_pos:
         try:
             GS.player_pos = tuple(start_pos)
         except Exception:
-            GS.player_pos = player_pos
+            GS.player_pos = prepared.player_pos
     else:
-        GS.player_pos = player_pos
+        GS.player_pos = prepared.player_pos
     GS.floor = nf
 
-    # apply recorded changes for this floor
-    for rec in gridChanges:
-        if rec[0] != nf:
-            continue
-        _, gx, gy, s0, s1 = rec
-        try:
-            if 0 <= gy < GS.h and 0 <= gx < GS.w:
-                # ensure underlying structure is list-like
-                if isinstance(GS.value_grid[gy][gx], (list, tuple)):
-                    GS.value_grid[gy][gx][0] = s0
-                    GS.value_grid[gy][gx][1] = s1
-                else:
-                    GS.value_grid[gy][gx] = [s0, s1]
-                try:
-                    GS.grid[gy][gx] = GS.ct[s0]
-                except Exception:
-                    GS.grid[gy][gx] = " "
-        except Exception:
-            pass
+    sync_enemies(nf)
 
-    for y in range(GS.h):
-        for x in range(GS.w):
-            cell = GS.value_grid[y][x]
-            if isinstance(cell, (list, tuple)) and len(cell) > 1:
-                if cell[0] == 13 and int(cell[1]) == start_pos:
-                    #print("----- START POS found -----")
-                    GS.player_pos = (x, y)  # x = column, y = row
-                    #print(GS.player_pos)
-                    return True
+    # the arrival point matching the stair code
+    if start_pos in prepared.arrivals:
+        GS.player_pos = prepared.arrivals[start_pos]
     return True
 
 def new_level(new_floor, start_pos=None):
@@ -197,9 +266,51 @@ def new_level(new_floor, start_pos=None):
     #print(GS.player_pos)
     return load_level(new_floor, start_pos)
 
+def stair_target(x, y):
+    """The floor the stair on (x, y) loads, or None (not a stair, the exit, or down from floor 0)."""
+    tile = GS.grid[y][x]
+    if not (isinstance(tile, str) and tile[:1] in ("^", "v")):
+        return None
+    if (tile[0] == "^" and GS.floor == FINAL_FLOOR) or (tile[0] == "v" and GS.floor == 0):
+        return None
+    return GS.value_grid[y][x][1] // 100
+
+def stairs_near(radius):
+    """Floors reached by the stairs within radius tiles of the player (Chebyshev), except this one."""
+    x, y = GS.player_pos
+    floors = set()
+    for sy in range(max(0, y - radius), min(GS.h, y + radius + 1)):
+        for sx in range(max(0, x - radius), min(GS.w, x + radius + 1)):
+            target = stair_target(sx, sy)
+            if target is not None:
+                floors.add(target)
+    floors.discard(GS.floor)
+    return floors
+
+def uncached_stair_target(direction):
+    """
+    If moving in direction would take a stair to a level that has not been
+    parsed yet, return that level's file name so the caller can load it off
+    the event loop first. Otherwise return None.
+    """
+    if direction not in MOVE_OFFSETS or GS.value_grid is None:
+        return None
+    x, y = GS.player_pos
+    dx, dy = MOVE_OFFSETS[direction]
+    nx, ny = x + dx, y + dy
+    if not (0 <= ny < GS.h and 0 <= nx < GS.w):
+        return None
+    target = stair_target(nx, ny)
+    if target is None:
+        return None
+    fname = f"level_{target}.txt"
+    return None if is_level_cached(fname) else fname
+
 # ============================================================
 #  MOVEMENT (uses GS globals) - call as move_player(direction)
 # ============================================================
+@metrics.timed(metrics.move_latency)
+@tracing.traced()
 def move_player(direction):
     # print("PMV")
     """
@@ -216,11 +327,10 @@ def move_player(direction):
     grid = GS.grid
     vg = GS.value_grid
 
-    offsets = {"w": (0,-1), "s": (0,1), "a": (-1,0), "d": (1,0)}
-    if direction not in offsets:
+    if direction not in MOVE_OFFSETS:
         return GS.player_pos
 
-    dx, dy = offsets[direction]
+    dx, dy = MOVE_OFFSETS[direction]
     nx, ny = x + dx, y + dy
 
     # bounds
@@ -238,7 +348,7 @@ def move_player(direction):
         tile_val = None
 
     # solid collision: walls and enemies
-    if tile_char in basic_solid:
+    if tile_char in walls or enemy_at(nx, ny) is not None:
         return GS.player_pos
 
     # DOOR: block unless key present
@@ -246,9 +356,8 @@ def move_player(direction):
     if tile_char == "=":
         key_id = tile_val[1] if isinstance(tile_val, (list, tuple)) and len(tile_val) > 1 else None
         if key_id in collectedKeys:
-            new_floor = getAdjacentFloorTile(nx, ny)
-            # convert door to floor and clear key ID
-            add_gridchange(GS.floor, nx, ny, 2, new_floor)
+            # convert door to floor (subtype precomputed at level load) and clear key ID
+            add_gridchange(GS.floor, nx, ny, 2, GS.replacement_floors.get((nx, ny), 0))
             print("Door unlocked.")
             GS.message = "Door unlocked."
             # now move player onto the tile
@@ -266,33 +375,30 @@ def move_player(direction):
         collectedKeys.add(key_id)
         print(f"Picked up a key: {key_id}")
         GS.message = f"Picked up a key: {key_id}"
-        new_floor = getAdjacentFloorTile(nx, ny)
         # convert tile to floor and clear key ID
-        add_gridchange(GS.floor, nx, ny, 2, new_floor)
+        add_gridchange(GS.floor, nx, ny, 2, GS.replacement_floors.get((nx, ny), 0))
         GS.player_pos = (nx, ny)
         return GS.player_pos
 
     if tile_char == "^":
         print("Going up a floor!")
         # Check if we're on level 6 (final level) - if so, game is complete
-        if GS.floor == 6:
+        if GS.floor == FINAL_FLOOR:
             print("Game completed!")
             GS.message = "You escaped!"
             GS.game_complete = True
             return GS.player_pos
         
-        GS.floor = tile_val[1]//100
-        GS.message = "Going up a floor! Current Floor: " + str(GS.floor + 1)
-        new_level(GS.floor,tile_val[1]%100)
+        # a level that fails to load leaves the player where they are
+        if new_level(tile_val[1]//100, tile_val[1]%100):
+            GS.message = "Going up a floor! Current Floor: " + str(GS.floor + 1)
         return GS.player_pos
     
     if tile_char == "v":
         print("Going down a floor!")
         # Don't go below floor 0
-        if GS.floor > 0:
-            GS.floor = tile_val[1]//100
+        if GS.floor > 0 and new_level(tile_val[1]//100, tile_val[1]%100):
             GS.message = "Going down a floor! Current Floor: " + str(GS.floor - 1)
-            new_level(GS.floor,tile_val[1]%100)
         return GS.player_pos
 
 
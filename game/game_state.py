@@ -8,4 +8,6 @@ value_grid = None
 player_pos = (0, 0)
 basic_tiles = {}
 message = None  # Current message to display to player
-game_complete = False  # Set to True when player finishes the game
\ No newline at end of file
+game_complete = False  # Set to True when player finishes the game
+night = False  # Shrinks the player's view radius (see visibility.py)
+replacement_floors = {}  # (x, y) -> floor subtype a door/key/roomba spawn turns into (see game.replacement_floors)
\ No newline at end of file
@@ -0,0 +1,149 @@
+# inbound.py
+"""
+Per-client input queue.
+
+A reader task pulls every message off the socket as soon as it arrives,
+validates it cheaply and queues the move, so the room can apply all
+pending moves in one go each tick. A token bucket caps how many moves a
+client may make per second; anything over the limit (or malformed) is
+dropped before it costs more than a length check.
+
+Moves carry the client's sequence number. Once a tick has drained the
+queue, every move received before it has been applied or dropped, so
+acked (the last seq received) is sent back just before the next frame and
+the client can drop its predictions up to there (see game.js).
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+import websockets
+
+import metrics
+
+MAX_MESSAGE_BYTES = 128     # a move is ~13 bytes; anything much larger is junk
+MAX_MOVES_PER_SEC = 15      # sustained move rate per client
+MOVE_BURST = 5              # moves allowed back to back before the rate applies
+MAX_PENDING_MOVES = 8       # moves held between ticks
+
+VALID_MOVES = ("w", "a", "s", "d")
+MAX_SEQ = 2 ** 53           # largest integer a JS number holds exactly
+
+# Exactly what game.js's JSON.stringify sends (no spaces), so the common
+# case never reaches json.loads: {"move":"w","seq":12}, or {"move":"w"}
+# from clients without sequence numbers
+FAST_PREFIX = {f'{{"move":"{m}","seq":': m for m in VALID_MOVES}
+PREFIX_LEN = len(next(iter(FAST_PREFIX)))
+FAST_MOVES = {json.dumps({"move": m}, separators=(",", ":")): m for m in VALID_MOVES}
+
+
+def parse_fast(msg):
+    """(move, seq) if msg is in the exact form game.js sends, else None."""
+    move = FAST_MOVES.get(msg)
+    if move:
+        return move, None
+    move = FAST_PREFIX.get(msg[:PREFIX_LEN])
+    digits = msg[PREFIX_LEN:-1]
+    if move and msg[-1] == "}" and digits.isascii() and digits.isdigit():
+        seq = int(digits)  # digits is short: msg is at most MAX_MESSAGE_BYTES
+        return move, seq if seq < MAX_SEQ else None
+    return None
+
+
+def parse_move(msg):
+    """
+    Return (move, seq) for a valid move message, or None. seq is None when
+    the client sent no sequence number.
+    """
+    if not isinstance(msg, str) or len(msg) > MAX_MESSAGE_BYTES or not msg.startswith("{"):
+        return None
+    fast = parse_fast(msg)
+    if fast:
+        return fast
+    try:
+        data = json.loads(msg)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get("move") not in VALID_MOVES:
+        return None
+    seq = data.get("seq")
+    if type(seq) is not int or not 0 <= seq < MAX_SEQ:
+        seq = None
+    return data["move"], seq
+
+
+class InputQueue:
+    def __init__(self, ready=None, rate=MAX_MOVES_PER_SEC, burst=MOVE_BURST, maxsize=MAX_PENDING_MOVES):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.moves = deque()
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.rejected = 0       # malformed messages
+        self.throttled = 0      # over the rate limit or queue full
+        self.last_seq = 0       # seq of the latest move received
+        self.acked = 0          # last_seq as of the latest drain
+        self.ready = ready if ready is not None else asyncio.Event()  # set when a move is queued
+
+    def __len__(self):
+        return len(self.moves)
+
+    def _take_token(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def push(self, msg):
+        parsed = parse_move(msg)
+        if parsed is None:
+            self.rejected += 1
+            metrics.moves_rejected.inc()
+            return
+        move, seq = parsed
+        if seq is not None:
+            self.last_seq = seq
+        if len(self.moves) >= self.maxsize or not self._take_token():
+            self.throttled += 1
+            metrics.moves_rejected.inc()
+            return
+        self.moves.append(move)
+        self.ready.set()
+
+    def drain(self):
+        """Return and clear every move queued since the last drain."""
+        moves = list(self.moves)
+        self.moves.clear()
+        self.acked = self.last_seq
+        return moves
+
+
+async def read_moves(ws, inbox):
+    """Feed every incoming message into inbox until the connection closes."""
+    try:
+        async for msg in ws:
+            inbox.push(msg)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+if __name__ == "__main__":
+    # The messages game.js sends must take the fast path, and parse the
+    # same way json.loads would
+    for m in VALID_MOVES:
+        for msg, expected in ((json.dumps({"move": m, "seq": 12}, separators=(",", ":")), (m, 12)),
+                              (json.dumps({"move": m}, separators=(",", ":")), (m, None))):
+            assert parse_fast(msg) == expected, msg
+            assert parse_move(msg) == expected, msg
+    assert parse_fast('{"move": "w"}') is None and parse_move('{"move": "w"}') == ("w", None)
+    # seq out of range is dropped on both paths
+    for seq in (MAX_SEQ - 1, MAX_SEQ, 10 ** 40):
+        msg = json.dumps({"move": "w", "seq": seq}, separators=(",", ":"))
+        expected = ("w", seq if seq < MAX_SEQ else None)
+        assert parse_move(msg) == parse_move(msg.replace(":", ": ")) == expected, msg
+    print("fast path ok")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Validate, normalize and convert level files in parallel.
+
+Every file is parsed with level_format (the same parser the game and the
+editor use), checked (width/height against the rows, tile codes against
+basic_tiles) and normalized (explicit numbers, rows padded to width,
+canonical header). Files are spread over a process pool, so hundreds of
+large levels take about as long as the slowest few.
+
+    python level_batch.py                      # check assets/levels/*.txt
+    python level_batch.py --write              # rewrite them normalized in place
+    python level_batch.py --out build/levels   # write normalized copies elsewhere
+    python level_batch.py -j 8 generated/*.txt
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+from level_format import parse_level_text, validate, normalize, format_level
+from game import level_path_for
+
+LEVEL_DIR = os.path.dirname(level_path_for("level_0.txt"))
+
+
+def process_file(path, out_dir=None, write=False):
+    """
+    Check and normalize one file. Returns (path, problems, changed, seconds, tiles);
+    changed means the normalized text differs from the file.
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, "r") as f:
+            text = f.read()
+        level = parse_level_text(text)
+        problems = validate(level)
+        normal = normalize(level)
+        out = format_level(normal)
+    except (OSError, UnicodeDecodeError) as e:
+        return path, [str(e)], False, time.perf_counter() - start, 0
+
+    changed = out != text
+    target = None
+    if out_dir:
+        target = os.path.join(out_dir, os.path.basename(path))
+    elif write and changed:
+        target = path
+    if target:
+        tmp = target + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(out)
+        os.replace(tmp, target)  # never leave a half-written level for the hot reloader
+    return path, problems, changed, time.perf_counter() - start, normal.width * normal.height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="level files (default: every .txt in assets/levels)")
+    parser.add_argument("--write", action="store_true", help="rewrite files that are not normalized")
+    parser.add_argument("--out", help="write normalized copies of every file into this directory")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only list files with problems")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(LEVEL_DIR, "*.txt")))
+    if not files:
+        print("no level files found")
+        sys.exit(1)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    # Chunks of files per task keep the pool's pickling overhead small for many small levels
+    chunksize = max(1, len(files) // (4 * max(1, args.jobs)))
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(process_file, files, [args.out] * len(files), [args.write] * len(files),
+                                chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    bad = changed = tiles = 0
+    work = 0.0
+    for path, problems, was_changed, seconds, n_tiles in results:
+        bad += bool(problems)
+        changed += was_changed
+        tiles += n_tiles
+        work += seconds
+        if problems or not args.quiet:
+            status = "✗" if problems else ("~ normalized" if was_changed else "✓")
+            print(f"{status} {os.path.basename(path)}: {n_tiles:,} tiles in {seconds * 1000:.1f} ms")
+        for p in problems[:10]:
+            print(f"    {p}")
+        if len(problems) > 10:
+            print(f"    ... {len(problems) - 10} more")
+
+    verb = "rewritten" if args.write else "not normalized"
+    print(f"{len(files)} files, {tiles:,} tiles in {elapsed:.2f}s wall ({work:.2f}s of work, "
+          f"{args.jobs} jobs): {bad} with problems, {changed} {verb}")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,24 @@
 Full tile editor with:
 - resizable window
 - bottom UI panel with wrapping
-- pan/zoom, auto-expand map (adds empty rows/cols BEFORE on negative pan)
-- save/load (Shift+S / Shift+L) with trimmed width/height header
+- pan/zoom over an unbounded sparse map (chunks allocated as you paint, negative coords included)
+- save/load (Shift+S / Shift+L) of the file named on the command line (default tilemap.txt), trimmed width/height header
 - eyedropper (E), drag-paint, forced numbers for -1 tiles, numbers shown on tiles
-- art loading with error texture fallback
+- art loading with error texture fallback: every image is read once at startup
+  (background thread) and scaled per zoom from a mip chain into bounded LRU caches
+- redraws only what changed: composed tile surfaces are cached per zoom,
+  edits mark their tiles dirty, and the used bbox is kept up to date on edit
+- rectangle select (Shift+drag), fill (F), flood fill (G), copy/paste (Ctrl+C/V)
+- undo/redo (Ctrl+Z / Ctrl+Y), each action stored as run-length diffs
 """
 
 import os
 import pygame
 import sys
+import threading
+from collections import OrderedDict
+
+from level_format import basic_tiles, EMPTY, parse_level_text, to_editor_tile, from_editor_tile
 
 # -------------------- CONFIG --------------------
 TILE_SIZE = 32
@@ -19,28 +28,20 @@ TILE_SIZE = 32
 VIEW_WIDTH = 16
 VIEW_HEIGHT = 16
 
-# initial map size (can expand)
-MAP_WIDTH = 100
-MAP_HEIGHT = 100
+# map storage: tiles live in CHUNK_SIZE x CHUNK_SIZE chunks allocated on demand
+CHUNK_SIZE = 32
 
 # assets dir (change if needed)
 ASSETS_DIR = os.path.join("..", "assets", "art")
 
-basic_tiles = {
-    "-": [0, -2],  # empty
-    "#": [1, -1],  # wall
-    " ": [2, -1],  # floor
-    "*": [3, -2],  # player
-    "=": [9, -1],  # door
-    "<": [8, -1],  # keycard
-    "?": [7, -1],  # interactable
-    "E": [0, -1],  # enemy
-    "^": [11, -1], # stair up
-    "v": [12, -1], # stair down
-    "@": [13, -1], # from stair
-    "c": [21, -1], # chest
-    "p": [22, -1]  # powerup
-}
+# scaled art kept across zoom levels (LRU): IMAGE_CACHE holds one surface per
+# (art file, tile size), TILE_SURFACE_CACHE one per (tile, tile size)
+IMAGE_CACHE_SIZE = 512
+TILE_SURFACE_CACHE_SIZE = 1024
+MIN_MIP_SIZE = 8   # smallest level of an image's mip chain
+
+# file Shift+S / Shift+L save to and load from: python level_editor.py [file]
+MAP_FILE = sys.argv[1] if len(sys.argv) > 1 else "tilemap.txt"
 
 TILE_COLORS = {
     "-": (30, 30, 30),
@@ -60,6 +61,29 @@ TILE_COLORS = {
 
 UI_PANEL_HEIGHT = 110  # height for bottom UI panel (wraps text here)
 
+# -------------------- LRU CACHE --------------------
+class LRUCache:
+    """Dict-like cache holding at most maxsize entries, evicting the least recently used"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
 # -------------------- PYGAME INIT --------------------
 pygame.init()
 # window starts resizable
@@ -70,7 +94,6 @@ pygame.display.set_caption("Tile Editor")
 base_font = pygame.font.SysFont(None, 18)
 
 # -------------------- GLOBAL STATE --------------------
-tile_map = [["-" for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
 offset_x = 0
 offset_y = 0
 
@@ -82,9 +105,35 @@ pending_value = ""  # typed integer for -1 tiles
 dragging = False
 paint_tile = selected_tile
 
-IMAGE_CACHE = {}  # (char,num,size) -> Surface
+# Selection and clipboard
+selection = None     # (x0, y0, x1, y1) inclusive, or None
+selecting = False    # Shift+drag in progress
+select_start = None
+selection_moved = False  # outline needs drawing even if no tile changed
+clipboard = None     # list of rows of tiles
+
+# History: each entry is one action as runs (x, y, length, old, new)
+MAX_HISTORY = 200
+undo_stack = []
+redo_stack = []
+current_edit = None  # list of (x, y, length, old, new) while an action is being recorded
+
+IMAGE_CACHE = LRUCache(IMAGE_CACHE_SIZE)  # (file name,size) -> scaled art
+TILE_SURFACE_CACHE = LRUCache(TILE_SURFACE_CACHE_SIZE)  # (tile,size) -> art + border + number, ready to blit
+FONT_CACHE = {}  # size -> Font
 clock = pygame.time.Clock()
 
+# Redraw tracking: tiles edited since the last frame, and whether the whole
+# view must be redrawn (pan, zoom, resize, load)
+dirty_tiles = set()
+full_redraw = True
+last_view = None     # (offset_x, offset_y, TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT) last drawn
+last_ui_text = None
+
+# Bounding box of non-empty tiles, kept up to date by set_tile
+used_bbox = None     # (min_x, min_y, max_x, max_y) or None when the map is empty
+bbox_stale = False   # an edge tile was erased; rescan on next use
+
 # -------------------- ERROR TEXTURE --------------------
 # Try to load error.png, otherwise create a magenta X surface
 def make_error_texture(size):
@@ -102,126 +151,228 @@ if os.path.exists(os.path.join(ASSETS_DIR, "error.png")):
 else:
     ERROR_TEXTURE_BASE = make_error_texture(64)
 
+# -------------------- ART PRELOAD --------------------
+# Every .png in ASSETS_DIR is read once, in a background thread started at
+# import, into ART: file name -> [source, half size, quarter size, ...].
+# load_tile_image scales from the smallest of those that still covers the
+# tile size, so drawing never touches the filesystem.
+ART = {}
+art_ready = threading.Event()
+
+def build_mips(img):
+    """img followed by halved copies down to MIN_MIP_SIZE"""
+    levels = [img]
+    while min(levels[-1].get_size()) // 2 >= MIN_MIP_SIZE:
+        w, h = levels[-1].get_size()
+        levels.append(pygame.transform.smoothscale(levels[-1], (w // 2, h // 2)))
+    return levels
+
+ERROR_MIPS = build_mips(ERROR_TEXTURE_BASE)
+
+def preload_art():
+    try:
+        names = sorted(n for n in os.listdir(ASSETS_DIR) if n.lower().endswith(".png"))
+    except OSError as e:
+        print(f"[ART ERROR] Could not list {ASSETS_DIR}: {e}")
+        names = []
+    for name in names:
+        try:
+            loaded = pygame.image.load(os.path.join(ASSETS_DIR, name))
+            # 32-bit copy: convert_alpha needs the display, which belongs to the main thread
+            img = pygame.Surface(loaded.get_size(), pygame.SRCALPHA, 32)
+            img.blit(loaded, (0, 0))
+            ART[name] = build_mips(img)
+        except Exception as e:
+            print(f"[ART ERROR] Could not load {name}: {e}")
+    art_ready.set()
+
+threading.Thread(target=preload_art, name="art-preload", daemon=True).start()
+
 # -------------------- IMAGE LOADER WITH ERROR FALLBACK --------------------
+def tile_art_name(char, num):
+    """
+    File name of the art for char+num (edit as needed to match your files),
+    or None for tiles without art
+    """
+    # floors/walls use different images depending on num variant
+    if char == "#":
+        return "wood_wall.png" if num == "1" else "concrete_wall.png"
+    if char == " ":
+        return {"1": "wood_floor.png", "2": "green_carpet.png", "3": "tile_floor.png"}.get(num, "concrete_floor.png")
+    if char == "E":
+        # try specific roomba variants first
+        if num and num.isdigit() and f"roomba_{num}.png" in ART:
+            return f"roomba_{num}.png"
+        return "roomba.png" if "roomba.png" in ART else None
+    return {
+        "*": "duck_player.png",
+        "=": "door_template.png",
+        "<": "Keycard.png",
+        "c": "Chest.png",
+        "p": "cardboard_box.png",
+        "^": "StairsVerticle.png",
+        "v": "StairsVerticle.png",
+        "@": "tile_floor.png",
+        "?": "door_templates.png",
+    }.get(char)
+
+def scale_art(levels, size):
+    """A mip chain scaled to size x size, from the smallest level that covers it"""
+    src = levels[0]
+    for level in levels[1:]:
+        if level.get_width() < size or level.get_height() < size:
+            break
+        src = level
+    if src.get_size() != (size, size):
+        src = pygame.transform.smoothscale(src, (size, size))
+    return src.convert_alpha()
+
 def load_tile_image(char, num, size):
     """
-    Safe loader that maps char+num -> filepath(s), loads & scales,
+    Safe loader that maps char+num -> preloaded art scaled to size,
     returns ERROR_TEXTURE if anything goes wrong.
     """
-    key = (char, num, size)
-    if key in IMAGE_CACHE:
-        return IMAGE_CACHE[key]
+    if not art_ready.is_set():
+        art_ready.wait()  # only the first frame can get here before the preload is done
+    name = tile_art_name(char, num)
+    key = (name, size)
+    img = IMAGE_CACHE.get(key)
+    if img is not None:
+        return img
 
     try:
-        # map char/num to file path (edit as needed to match your files)
-        # floors/walls use different images depending on num variant
-        path = None
-        if char == "#":
-            path = os.path.join(ASSETS_DIR, "wood_wall.png") if num == "1" else os.path.join(ASSETS_DIR, "concrete_wall.png")
-        elif char == " ":
-            if num == "1":
-                path = os.path.join(ASSETS_DIR, "wood_floor.png")
-            elif num == "2":
-                path = os.path.join(ASSETS_DIR, "green_carpet.png")
-            elif num == "3":
-                path = os.path.join(ASSETS_DIR, "tile_floor.png")
-            else:
-                path = os.path.join(ASSETS_DIR, "concrete_floor.png")
-        elif char == "*":
-            path = os.path.join(ASSETS_DIR, "duck_player.png")
-        elif char == "=":
-            path = os.path.join(ASSETS_DIR, "door_template.png")
-        elif char == "<":
-            path = os.path.join(ASSETS_DIR, "Keycard.png")
-        elif char == "c":
-            path = os.path.join(ASSETS_DIR, "Chest.png")
-        elif char == "p":
-            path = os.path.join(ASSETS_DIR, "cardboard_box.png")
-        elif char == "^":
-            path = os.path.join(ASSETS_DIR, "StairsVerticle.png")
-        elif char == "v":
-            path = os.path.join(ASSETS_DIR, "StairsVerticle.png")
-        elif char == "E":
-
-            # try specific roomba variants first
-            if num and num.isdigit():
-                candidate = os.path.join(ASSETS_DIR, f"roomba_{num}.png")
-                if os.path.exists(candidate):
-                    path = candidate
-            if path is None:
-                candidate = os.path.join(ASSETS_DIR, "roomba.png")
-                if os.path.exists(candidate):
-                    path = candidate
-                else:
-                    path = None
-        elif char in ("^","v","@"):
-            path = os.path.join(ASSETS_DIR, "tile_floor.png")
-        elif char == "?":
-            path = os.path.join(ASSETS_DIR, "door_templates.png")
-        else:
-            path = None
-
-        if path and os.path.exists(path):
-            img = pygame.image.load(path).convert_alpha()
-            if img.get_width() != size or img.get_height() != size:
-                img = pygame.transform.smoothscale(img, (size, size))
-            IMAGE_CACHE[key] = img
-            return img
-        else:
-            # no file found / not intended to have art
-            tex = pygame.transform.smoothscale(ERROR_TEXTURE_BASE, (size, size))
-            IMAGE_CACHE[key] = tex
-            return tex
-
+        # no file found / not intended to have art
+        img = scale_art(ART.get(name, ERROR_MIPS), size)
     except Exception as e:
         # print small debug message and return error texture scaled to size
-        print(f"[ART ERROR] Could not load tile art for {char}{num}: {e}")
-        tex = pygame.transform.smoothscale(ERROR_TEXTURE_BASE, (size, size))
-        IMAGE_CACHE[key] = tex
-        return tex
-
-def clear_image_cache():
-    IMAGE_CACHE.clear()
+        print(f"[ART ERROR] Could not scale tile art for {char}{num}: {e}")
+        img = scale_art(ERROR_MIPS, size)
+    IMAGE_CACHE.put(key, img)
+    return img
+
+def get_font(size):
+    font = FONT_CACHE.get(size)
+    if font is None:
+        font = FONT_CACHE[size] = pygame.font.SysFont(None, size)
+    return font
+
+def get_tile_surface(tile, size):
+    """Tile art with its border and number drawn on, cached per (tile, size)"""
+    key = (tile, size)
+    surf = TILE_SURFACE_CACHE.get(key)
+    if surf is not None:
+        return surf
+    ch, num = get_tile_char_num(tile)
+    surf = pygame.Surface((size, size), pygame.SRCALPHA)
+    surf.blit(load_tile_image(ch, num, size), (0, 0))
+    pygame.draw.rect(surf, (40,40,40), surf.get_rect(), max(1, size // 16))
+    # draw number always if present
+    if num is not None:
+        num_surf = get_font(max(10, size // 2)).render(str(num), True, (255,255,255))
+        surf.blit(num_surf, (2, 2))
+    TILE_SURFACE_CACHE.put(key, surf)
+    return surf
 
-# -------------------- MAP EXPANSION --------------------
-def expand_map_to_include(gx, gy):
+# -------------------- MAP STORAGE --------------------
+class ChunkMap:
     """
-    Expand tile_map so (gx,gy) is inside. Adds empty columns/rows BEFORE existing content
-    when gx<0 or gy<0 (your choice A). Adjusts offsets so camera continues to point at same cells.
+    Sparse tile store. The map is cut into CHUNK_SIZE x CHUNK_SIZE chunks
+    keyed by chunk coordinate; a chunk is allocated the first time something
+    is painted in it and dropped again once it is all EMPTY, so any
+    coordinate (negative too) is valid and memory follows the painted area.
     """
-    global tile_map, MAP_WIDTH, MAP_HEIGHT, offset_x, offset_y
-
-    add_left = add_top = add_right = add_bottom = 0
-
-    if gx < 0:
-        add_left = -gx
-    if gy < 0:
-        add_top = -gy
-    if gx >= MAP_WIDTH:
-        add_right = gx - (MAP_WIDTH - 1)
-    if gy >= MAP_HEIGHT:
-        add_bottom = gy - (MAP_HEIGHT - 1)
-
-    if add_left or add_top or add_right or add_bottom:
-        new_w = MAP_WIDTH + add_left + add_right
-        new_h = MAP_HEIGHT + add_top + add_bottom
-        new_map = [["-" for _ in range(new_w)] for _ in range(new_h)]
-        # copy old into new at offset (add_top, add_left)
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
-                new_map[y + add_top][x + add_left] = tile_map[y][x]
-        tile_map = new_map
-        MAP_WIDTH = new_w
-        MAP_HEIGHT = new_h
-        offset_x += add_left
-        offset_y += add_top
-
-def ensure_view_within_map():
-    global offset_x, offset_y
-    if offset_x < 0 or offset_y < 0:
-        expand_map_to_include(offset_x, offset_y)
-    if offset_x + VIEW_WIDTH > MAP_WIDTH or offset_y + VIEW_HEIGHT > MAP_HEIGHT:
-        expand_map_to_include(offset_x + VIEW_WIDTH - 1, offset_y + VIEW_HEIGHT - 1)
+
+    def __init__(self):
+        self.chunks = {}   # (cx, cy) -> flat list of CHUNK_SIZE*CHUNK_SIZE tiles
+        self.counts = {}   # (cx, cy) -> non-empty tiles in that chunk
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def get(self, x, y):
+        chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is None:
+            return EMPTY
+        return chunk[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def set(self, x, y, tile):
+        key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if tile == EMPTY:
+                return
+            chunk = self.chunks[key] = [EMPTY] * (CHUNK_SIZE * CHUNK_SIZE)
+            self.counts[key] = 0
+        i = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        old = chunk[i]
+        chunk[i] = tile
+        delta = (tile != EMPTY) - (old != EMPTY)
+        if delta:
+            self.counts[key] += delta
+            if not self.counts[key]:
+                del self.chunks[key], self.counts[key]
+
+    def set_span(self, x0, x1, y, tile):
+        """Set tiles (x0..x1, y) inclusive to tile, a chunk-row slice at a time"""
+        cy, off = y // CHUNK_SIZE, (y % CHUNK_SIZE) * CHUNK_SIZE
+        x = x0
+        while x <= x1:
+            cx = x // CHUNK_SIZE
+            end = min(x1, cx * CHUNK_SIZE + CHUNK_SIZE - 1)
+            key = (cx, cy)
+            chunk = self.chunks.get(key)
+            if chunk is None and tile != EMPTY:
+                chunk = self.chunks[key] = [EMPTY] * (CHUNK_SIZE * CHUNK_SIZE)
+                self.counts[key] = 0
+            if chunk is not None:
+                a, b = off + x % CHUNK_SIZE, off + end % CHUNK_SIZE + 1
+                was_empty = chunk[a:b].count(EMPTY)
+                chunk[a:b] = [tile] * (b - a)
+                now_empty = (b - a) if tile == EMPTY else 0
+                self.counts[key] += was_empty - now_empty
+                if not self.counts[key]:
+                    del self.chunks[key], self.counts[key]
+            x = end + 1
+
+    def clear(self):
+        self.chunks.clear()
+        self.counts.clear()
+
+    def row(self, y, x0, x1):
+        """Tiles (x0..x1, y) inclusive, copied a chunk-row slice at a time"""
+        out = []
+        cy, off = y // CHUNK_SIZE, (y % CHUNK_SIZE) * CHUNK_SIZE
+        x = x0
+        while x <= x1:
+            cx = x // CHUNK_SIZE
+            end = min(x1, cx * CHUNK_SIZE + CHUNK_SIZE - 1)
+            chunk = self.chunks.get((cx, cy))
+            if chunk is None:
+                out.extend([EMPTY] * (end - x + 1))
+            else:
+                out.extend(chunk[off + x % CHUNK_SIZE: off + end % CHUNK_SIZE + 1])
+            x = end + 1
+        return out
+
+    def used_bbox(self):
+        """(min_x, min_y, max_x, max_y) of non-empty tiles, or None; scans allocated chunks only"""
+        min_x = min_y = max_x = max_y = None
+        for (cx, cy), chunk in self.chunks.items():
+            for i, tile in enumerate(chunk):
+                if tile == EMPTY:
+                    continue
+                x = cx * CHUNK_SIZE + i % CHUNK_SIZE
+                y = cy * CHUNK_SIZE + i // CHUNK_SIZE
+                if min_x is None:
+                    min_x, max_x, min_y, max_y = x, x, y, y
+                else:
+                    min_x, max_x = min(min_x, x), max(max_x, x)
+                    min_y, max_y = min(min_y, y), max(max_y, y)
+        if min_x is None:
+            return None
+        return (min_x, min_y, max_x, max_y)
+
+tile_map = ChunkMap()
 
 # -------------------- TILE FORMAT --------------------
 def get_tile_char_num(tile):
@@ -232,23 +383,65 @@ def get_tile_char_num(tile):
         return tile, "0"
     return tile, None
 
+# -------------------- EDITING --------------------
+def set_tile(gx, gy, tile):
+    """Change one tile, keeping the bbox, redraw state and undo record up to date"""
+    old = tile_map.get(gx, gy)
+    if old == tile:
+        return
+    if current_edit is not None:
+        current_edit.append((gx, gy, 1, old, tile))
+    tile_map.set(gx, gy, tile)
+    dirty_tiles.add((gx, gy))
+    update_bbox(gx, gx, gy, tile)
+
+def set_span(x0, x1, y, old, tile):
+    """Change tiles (x0..x1, y) that all hold old to tile; bulk form of set_tile"""
+    if current_edit is not None:
+        current_edit.append((x0, y, x1 - x0 + 1, old, tile))
+    tile_map.set_span(x0, x1, y, tile)
+    if offset_y <= y < offset_y + VIEW_HEIGHT:
+        for x in range(max(x0, offset_x), min(x1, offset_x + VIEW_WIDTH - 1) + 1):
+            dirty_tiles.add((x, y))
+    update_bbox(x0, x1, y, tile)
+
+def update_bbox(x0, x1, y, tile):
+    global used_bbox, bbox_stale
+    if tile != "-":
+        if used_bbox is None:
+            used_bbox = (x0, y, x1, y)
+        else:
+            bx0, by0, bx1, by1 = used_bbox
+            used_bbox = (min(bx0, x0), min(by0, y), max(bx1, x1), max(by1, y))
+    elif used_bbox and (x0 <= used_bbox[0] or x1 >= used_bbox[2] or y in (used_bbox[1], used_bbox[3])):
+        bbox_stale = True  # may have shrunk; only a scan can tell
+
+def get_used_bbox():
+    global used_bbox, bbox_stale
+    if bbox_stale:
+        used_bbox = compute_used_bbox()
+        bbox_stale = False
+    return used_bbox
+
+def selected_tile_value():
+    """The tile string painting would place right now"""
+    if basic_tiles[selected_tile][1] == -1:
+        val = pending_value if pending_value else "0"
+        return f"{selected_tile}:{val}"
+    return selected_tile
+
+def invalidate_all():
+    """Redraw the whole view next frame (after bulk changes like a load)"""
+    global full_redraw
+    full_redraw = True
+
 # -------------------- SAVE / LOAD --------------------
 def compute_used_bbox():
-    min_x, max_x = MAP_WIDTH, -1
-    min_y, max_y = MAP_HEIGHT, -1
-    for y in range(MAP_HEIGHT):
-        for x in range(MAP_WIDTH):
-            if tile_map[y][x] != "-":
-                min_x = min(min_x, x)
-                max_x = max(max_x, x)
-                min_y = min(min_y, y)
-                max_y = max(max_y, y)
-    if max_x == -1:
-        return None
-    return (min_x, min_y, max_x, max_y)
+    return tile_map.used_bbox()
 
-def save_map_text(filename="tilemap.txt"):
-    bbox = compute_used_bbox()
+def save_map_text(filename=None):
+    filename = filename or MAP_FILE
+    bbox = get_used_bbox()
     if not bbox:
         print("Map empty, nothing to save.")
         return
@@ -259,63 +452,21 @@ def save_map_text(filename="tilemap.txt"):
         f.write(f"width = {trimmed_w}\n")
         f.write(f"height = {trimmed_h}\n")
         for y in range(min_y, max_y + 1):
-            line = ""
-            for x in range(min_x, max_x + 1):
-                tile = tile_map[y][x]
-                if ":" in tile:
-                    ch, num = tile.split(":", 1)
-                    line += f"{ch}{num}"
-                else:
-                    ch = tile
-                    if basic_tiles.get(ch, [0,-2])[1] == -1:
-                        line += f"{ch}0"
-                    else:
-                        line += ch
-            f.write(line + "\n")
+            f.write("".join(from_editor_tile(tile) for tile in tile_map.row(y, min_x, max_x)) + "\n")
     print(f"Map saved to {filename} (trimmed {trimmed_w}x{trimmed_h})")
 
-def parse_map_line_to_row(line):
-    row = []
-    i = 0
-    while i < len(line):
-        ch = line[i]
-        i += 1
-        num = ""
-        while i < len(line) and line[i].isdigit():
-            num += line[i]
-            i += 1
-        if num:
-            row.append(f"{ch}:{num}")
-        else:
-            row.append(ch)
-    return row
-
-def load_map_text(filename="tilemap.txt"):
-    global tile_map, MAP_WIDTH, MAP_HEIGHT, offset_x, offset_y
+def load_map_text(filename=None):
+    global offset_x, offset_y, bbox_stale
+    filename = filename or MAP_FILE
     if not os.path.exists(filename):
         print("File not found:", filename)
         return
     with open(filename, "r") as f:
-        lines = [ln.rstrip("\n") for ln in f.readlines()]
-
-    idx = 0
-    file_w = file_h = None
-    while idx < len(lines):
-        ln = lines[idx].strip()
-        if ln.startswith("width"):
-            try:
-                file_w = int(ln.split("=")[1].strip()); idx += 1; continue
-            except Exception:
-                file_w = None
-        if ln.startswith("height"):
-            try:
-                file_h = int(ln.split("=")[1].strip()); idx += 1; continue
-            except Exception:
-                file_h = None
-        break
-
-    map_lines = lines[idx:]
-    rows = [parse_map_line_to_row(ln) for ln in map_lines]
+        level = parse_level_text(f.read())
+
+    file_w, file_h = level.width, level.height
+    # the editor shows the chest table rows below the map
+    rows = [[to_editor_tile(t) for t in row] for row in level.rows + level.extra]
     new_h = len(rows)
     new_w = max((len(r) for r in rows), default=0)
     if file_w:
@@ -323,39 +474,181 @@ def load_map_text(filename="tilemap.txt"):
     if file_h:
         new_h = max(new_h, file_h)
 
-    # Expand map to fit loaded file
-    if new_w > MAP_WIDTH or new_h > MAP_HEIGHT:
-        for row in tile_map:
-            row.extend(["-"] * (new_w - MAP_WIDTH))
-        for _ in range(new_h - MAP_HEIGHT):
-            tile_map.append(["-"] * new_w)
-        MAP_WIDTH = max(MAP_WIDTH, new_w)
-        MAP_HEIGHT = max(MAP_HEIGHT, new_h)
-
-    # ensure rows have required width
-    for y in range(MAP_HEIGHT):
-        if len(tile_map[y]) < new_w:
-            tile_map[y].extend(["-"] * (new_w - len(tile_map[y])))
-
-    # copy into top-left
+    # copy into top-left (chunks are allocated as needed)
     for y, r in enumerate(rows):
         for x, t in enumerate(r):
-            tile_map[y][x] = t
+            tile_map.set(x, y, t)
 
     offset_x = 0
     offset_y = 0
-    clear_image_cache()
+    bbox_stale = True
+    undo_stack.clear()  # recorded diffs no longer match the map
+    redo_stack.clear()
+    invalidate_all()
     print(f"Loaded {filename} (size {new_w}x{new_h}) into editor")
 
 # -------------------- PLACEMENT --------------------
 def place_tile_at(gx, gy):
-    expand_map_to_include(gx, gy)
-    if 0 <= gx < MAP_WIDTH and 0 <= gy < MAP_HEIGHT:
-        if basic_tiles[selected_tile][1] == -1:
-            val = pending_value if pending_value else "0"
-            tile_map[gy][gx] = f"{selected_tile}:{val}"
+    set_tile(gx, gy, selected_tile_value())
+
+# -------------------- HISTORY --------------------
+def begin_edit():
+    """Start recording an action (a stroke, fill or paste) for undo"""
+    global current_edit
+    if current_edit is None:
+        current_edit = []
+
+def compress_edit(changes):
+    """
+    Merge recorded changes, in order, into runs (x, y, length, old, new)
+    of horizontally adjacent tiles with the same old and new value, so a
+    filled area costs one run per row rather than one entry per tile.
+    """
+    runs = []
+    for x, y, n, old, new in changes:
+        if runs:
+            rx, ry, rn, rold, rnew = runs[-1]
+            if ry == y and rx + rn == x and rold == old and rnew == new:
+                runs[-1] = (rx, ry, rn + n, old, new)
+                continue
+        runs.append((x, y, n, old, new))
+    return tuple(runs)
+
+def end_edit():
+    """Finish the current action and push it onto the undo stack"""
+    global current_edit
+    if current_edit is None:
+        return
+    runs = compress_edit(current_edit)
+    current_edit = None
+    if runs:
+        undo_stack.append(runs)
+        del undo_stack[:-MAX_HISTORY]
+        redo_stack.clear()
+
+def apply_runs(runs, use_new):
+    """Redo runs in order, or undo them newest first (a tile may be changed twice in one action)"""
+    for x, y, n, old, new in (runs if use_new else reversed(runs)):
+        if use_new:
+            set_span(x, x + n - 1, y, old, new)
         else:
-            tile_map[gy][gx] = selected_tile
+            set_span(x, x + n - 1, y, new, old)
+
+def undo():
+    end_edit()
+    if undo_stack:
+        runs = undo_stack.pop()
+        apply_runs(runs, use_new=False)
+        redo_stack.append(runs)
+
+def redo():
+    end_edit()
+    if redo_stack:
+        runs = redo_stack.pop()
+        apply_runs(runs, use_new=True)
+        undo_stack.append(runs)
+
+# -------------------- AREA OPERATIONS --------------------
+def set_selection(rect):
+    """Change the selection; tiles under the old outline are redrawn to erase it"""
+    global selection, selection_moved
+    if selection:
+        x0, y0, x1, y1 = selection
+        for x in range(x0, x1 + 1):
+            dirty_tiles.add((x, y0))
+            dirty_tiles.add((x, y1))
+        for y in range(y0, y1 + 1):
+            dirty_tiles.add((x0, y))
+            dirty_tiles.add((x1, y))
+    selection = rect
+    selection_moved = True
+
+def normalized_rect(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1]))
+
+def fill_rect(rect, tile):
+    x0, y0, x1, y1 = rect
+    begin_edit()
+    for y in range(y0, y1 + 1):
+        for x in range(x0, x1 + 1):
+            set_tile(x, y, tile)
+    end_edit()
+
+def flood_fill(gx, gy, tile):
+    """
+    Scanline flood fill of the 4-connected area of gx,gy's tile. The map is
+    unbounded, so the fill stays inside the used bbox plus the view. Rows
+    are read once into lists and each span is written as one set_span.
+    """
+    target = tile_map.get(gx, gy)
+    if target == tile:
+        return 0
+    bx0, by0 = offset_x, offset_y
+    bx1, by1 = offset_x + VIEW_WIDTH - 1, offset_y + VIEW_HEIGHT - 1
+    bbox = get_used_bbox()
+    if bbox:
+        bx0, by0 = min(bx0, bbox[0] - 1), min(by0, bbox[1] - 1)
+        bx1, by1 = max(bx1, bbox[2] + 1), max(by1, bbox[3] + 1)
+    if not (bx0 <= gx <= bx1 and by0 <= gy <= by1):
+        return 0
+
+    rows = {}  # y -> row of tiles bx0..bx1, kept in step with the fill
+    def row(y):
+        r = rows.get(y)
+        if r is None:
+            r = rows[y] = tile_map.row(y, bx0, bx1)
+        return r
+
+    begin_edit()
+    filled = 0
+    last = bx1 - bx0
+    stack = [(gx - bx0, gy)]
+    while stack:
+        i, y = stack.pop()
+        r = row(y)
+        if r[i] != target:
+            continue
+        # widen to the whole span of target on this row
+        left = right = i
+        while left > 0 and r[left - 1] == target:
+            left -= 1
+        while right < last and r[right + 1] == target:
+            right += 1
+        r[left:right + 1] = [tile] * (right - left + 1)
+        set_span(bx0 + left, bx0 + right, y, target, tile)
+        filled += right - left + 1
+        # seed one point per run of target in the rows above and below
+        for ny in (y - 1, y + 1):
+            if not by0 <= ny <= by1:
+                continue
+            nr = row(ny)
+            j = left
+            while j <= right:
+                if nr[j] == target:
+                    stack.append((j, ny))
+                    while j <= right and nr[j] == target:
+                        j += 1
+                j += 1
+    end_edit()
+    return filled
+
+def copy_selection():
+    global clipboard
+    if not selection:
+        return
+    x0, y0, x1, y1 = selection
+    clipboard = [tile_map.row(y, x0, x1) for y in range(y0, y1 + 1)]
+    print(f"Copied {x1 - x0 + 1}x{y1 - y0 + 1}")
+
+def paste_at(gx, gy):
+    """Paste the clipboard with its top-left corner on gx,gy"""
+    if not clipboard:
+        return
+    begin_edit()
+    for dy, row in enumerate(clipboard):
+        for dx, tile in enumerate(row):
+            set_tile(gx + dx, gy + dy, tile)
+    end_edit()
 
 # -------------------- UI TEXT WRAP --------------------
 def wrap_text_lines(text, font, max_width):
@@ -395,11 +688,121 @@ def recalc_view_counts_from_window():
     VIEW_WIDTH = max(4, avail_w // TILE_SIZE)
     VIEW_HEIGHT = max(3, avail_h // TILE_SIZE)
 
+# -------------------- DRAWING --------------------
+def draw_tile(gx, gy):
+    """Draw one map tile at its place in the view; returns the screen rect"""
+    vx, vy = gx - offset_x, gy - offset_y
+    rect = pygame.Rect(vx*TILE_SIZE, vy*TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    screen.blit(get_tile_surface(tile_map.get(gx, gy), TILE_SIZE), rect.topleft)
+    return rect
+
+def draw_ui():
+    """Redraw the bottom panel if its text changed; returns the rect drawn or None"""
+    global last_ui_text
+    bbox = get_used_bbox()
+    used_w = used_h = 0
+    if bbox:
+        used_w = bbox[2] - bbox[0] + 1
+        used_h = bbox[3] - bbox[1] + 1
+
+    info = f"Tile: {selected_tile}{('' if not pending_value else pending_value)}   Used W,H: {used_w},{used_h}   Chunks: {len(tile_map.chunks)}   Sel: {'none' if not selection else f'{selection[2]-selection[0]+1}x{selection[3]-selection[1]+1}'}   Undo: {len(undo_stack)}   Offset: {offset_x},{offset_y}   Tile size: {TILE_SIZE}px"
+    instructions = "Arrows / WASD: pan | Left/Right: switch tile | E: eyedropper | Shift+S: save | Shift+L: load | Z/X: zoom | Q: jump up-left | Shift+drag: select | F: fill selection | G: flood fill | Ctrl+C/V: copy/paste | Ctrl+Z/Y: undo/redo | Esc: clear selection"
+    help_text = info + "    " + instructions
+    if help_text == last_ui_text and not full_redraw:
+        return None
+    last_ui_text = help_text
+
+    ui_rect = pygame.Rect(0, SCREEN_HEIGHT - UI_PANEL_HEIGHT, SCREEN_WIDTH, UI_PANEL_HEIGHT)
+    pygame.draw.rect(screen, (18,18,18), ui_rect)
+    max_text_w = SCREEN_WIDTH - 16
+    wrapped = wrap_text_lines(help_text, base_font, max_text_w)
+    text_y = SCREEN_HEIGHT - UI_PANEL_HEIGHT + 6
+    for line in wrapped:
+        surf = base_font.render(line, True, (220,220,220))
+        screen.blit(surf, (8, text_y))
+        text_y += base_font.get_linesize()
+    return ui_rect
+
+def scroll_view(dx, dy):
+    """Shift the drawn view by (dx, dy) tiles and draw only the strips that came into view"""
+    view_rect = pygame.Rect(0, 0, VIEW_WIDTH*TILE_SIZE, VIEW_HEIGHT*TILE_SIZE)
+    screen.set_clip(view_rect)
+    screen.scroll(-dx*TILE_SIZE, -dy*TILE_SIZE)
+    screen.set_clip(None)
+    cols = range(offset_x + VIEW_WIDTH - dx, offset_x + VIEW_WIDTH) if dx > 0 else range(offset_x, offset_x - dx)
+    rows = range(offset_y + VIEW_HEIGHT - dy, offset_y + VIEW_HEIGHT) if dy > 0 else range(offset_y, offset_y - dy)
+    for gx in cols:
+        for gy in range(offset_y, offset_y + VIEW_HEIGHT):
+            draw_tile(gx, gy)
+    for gy in rows:
+        for gx in range(offset_x, offset_x + VIEW_WIDTH):
+            draw_tile(gx, gy)
+    return view_rect
+
+def draw_selection():
+    """Outline the selection (clipped to the view); returns the four edge rects drawn"""
+    x0, y0, x1, y1 = selection
+    rect = pygame.Rect((x0 - offset_x) * TILE_SIZE, (y0 - offset_y) * TILE_SIZE,
+                       (x1 - x0 + 1) * TILE_SIZE, (y1 - y0 + 1) * TILE_SIZE)
+    view_rect = pygame.Rect(0, 0, VIEW_WIDTH * TILE_SIZE, VIEW_HEIGHT * TILE_SIZE)
+    if not rect.colliderect(view_rect):
+        return []
+    screen.set_clip(view_rect)
+    pygame.draw.rect(screen, (255, 220, 0), rect, 2)
+    screen.set_clip(None)
+    edges = [pygame.Rect(rect.left, rect.top, rect.width, 2), pygame.Rect(rect.left, rect.bottom - 2, rect.width, 2),
+             pygame.Rect(rect.left, rect.top, 2, rect.height), pygame.Rect(rect.right - 2, rect.top, 2, rect.height)]
+    return [e.clip(view_rect) for e in edges if e.colliderect(view_rect)]
+
+def draw_frame():
+    """Redraw what changed since the last frame and push only those rects to the display"""
+    global full_redraw, last_view, selection_moved
+    view = (offset_x, offset_y, TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT)
+    rects = []
+    if view != last_view:
+        dx = offset_x - last_view[0] if last_view else 0
+        dy = offset_y - last_view[1] if last_view else 0
+        if (not full_redraw and last_view and view[2:] == last_view[2:]
+                and abs(dx) < VIEW_WIDTH and abs(dy) < VIEW_HEIGHT):
+            rects.append(scroll_view(dx, dy))  # a pan: most of the view is already drawn
+        else:
+            full_redraw = True
+        last_view = view
+
+    if full_redraw:
+        screen.fill((12,12,12))
+        for gy in range(offset_y, offset_y + VIEW_HEIGHT):
+            for gx in range(offset_x, offset_x + VIEW_WIDTH):
+                draw_tile(gx, gy)
+        if selection:
+            draw_selection()
+        draw_ui()
+        dirty_tiles.clear()
+        full_redraw = False
+        selection_moved = False
+        pygame.display.flip()
+        return
+
+    for gx, gy in dirty_tiles:
+        if offset_x <= gx < offset_x + VIEW_WIDTH and offset_y <= gy < offset_y + VIEW_HEIGHT:
+            rects.append(draw_tile(gx, gy))
+    dirty_tiles.clear()
+    # anything redrawn may have covered part of the outline
+    if selection and (rects or selection_moved):
+        rects.extend(draw_selection())
+    selection_moved = False
+    ui_rect = draw_ui()
+    if ui_rect:
+        rects.append(ui_rect)
+    if rects:
+        pygame.display.update(rects)
+
 # -------------------- MAIN LOOP --------------------
 def main_loop():
     global SCREEN_WIDTH, SCREEN_HEIGHT, screen
     global TILE_SIZE, VIEW_WIDTH, VIEW_HEIGHT, offset_x, offset_y
     global dragging, paint_tile, selected_index, selected_tile, pending_value
+    global selecting, select_start
 
     recalc_view_counts_from_window()
     running = True
@@ -413,7 +816,6 @@ def main_loop():
                 SCREEN_WIDTH, SCREEN_HEIGHT = event.w, event.h
                 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
                 recalc_view_counts_from_window()
-                clear_image_cache()
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mx, my = event.pos
@@ -422,18 +824,35 @@ def main_loop():
                     continue
                 gx = mx // TILE_SIZE + offset_x
                 gy = my // TILE_SIZE + offset_y
-                if event.button == 1:
+                if event.button == 1 and pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                    selecting = True
+                    select_start = (gx, gy)
+                    set_selection((gx, gy, gx, gy))
+                elif event.button == 1:
+                    begin_edit()
                     place_tile_at(gx, gy)
                     dragging = True
-                    paint_tile = tile_map[gy][gx]
+                    paint_tile = tile_map.get(gx, gy)
                 elif event.button == 3:
-                    expand_map_to_include(gx, gy)
-                    tile_map[gy][gx] = "-"
+                    begin_edit()
+                    set_tile(gx, gy, "-")
                     dragging = True
                     paint_tile = "-"
 
             elif event.type == pygame.MOUSEBUTTONUP:
                 dragging = False
+                selecting = False
+                end_edit()
+
+            elif event.type == pygame.MOUSEMOTION and selecting:
+                mx, my = event.pos
+                if my >= SCREEN_HEIGHT - UI_PANEL_HEIGHT:
+                    continue
+                gx = mx // TILE_SIZE + offset_x
+                gy = my // TILE_SIZE + offset_y
+                rect = normalized_rect(select_start, (gx, gy))
+                if rect != selection:
+                    set_selection(rect)
 
             elif event.type == pygame.MOUSEMOTION and dragging:
                 mx, my = event.pos
@@ -446,6 +865,38 @@ def main_loop():
             elif event.type == pygame.KEYDOWN:
                 mods = pygame.key.get_mods()
 
+                # Undo / redo / copy / paste: Ctrl+Z, Ctrl+Y (or Ctrl+Shift+Z), Ctrl+C, Ctrl+V
+                if mods & pygame.KMOD_CTRL:
+                    if event.key == pygame.K_z:
+                        redo() if mods & pygame.KMOD_SHIFT else undo()
+                    elif event.key == pygame.K_y:
+                        redo()
+                    elif event.key == pygame.K_c:
+                        copy_selection()
+                    elif event.key == pygame.K_v:
+                        mx, my = pygame.mouse.get_pos()
+                        if my < SCREEN_HEIGHT - UI_PANEL_HEIGHT:
+                            paste_at(mx // TILE_SIZE + offset_x, my // TILE_SIZE + offset_y)
+                    continue
+
+                # Fill selection: F
+                if event.key == pygame.K_f:
+                    if selection:
+                        fill_rect(selection, selected_tile_value())
+                    continue
+
+                # Flood fill under the mouse: G
+                if event.key == pygame.K_g:
+                    mx, my = pygame.mouse.get_pos()
+                    if my < SCREEN_HEIGHT - UI_PANEL_HEIGHT:
+                        flood_fill(mx // TILE_SIZE + offset_x, my // TILE_SIZE + offset_y, selected_tile_value())
+                    continue
+
+                # Clear selection: Esc
+                if event.key == pygame.K_ESCAPE:
+                    set_selection(None)
+                    continue
+
                 # Save: Shift+S
                 if event.key == pygame.K_s and (mods & pygame.KMOD_SHIFT):
                     save_map_text()
@@ -453,7 +904,7 @@ def main_loop():
 
                 # Load: Shift+L
                 if event.key == pygame.K_l and (mods & pygame.KMOD_SHIFT):
-                    load_map_text("tilemap.txt")
+                    load_map_text()
                     continue
 
                 # Eyedropper: E
@@ -463,14 +914,12 @@ def main_loop():
                         continue
                     gx = mx // TILE_SIZE + offset_x
                     gy = my // TILE_SIZE + offset_y
-                    expand_map_to_include(gx, gy)
-                    if 0 <= gx < MAP_WIDTH and 0 <= gy < MAP_HEIGHT:
-                        tile = tile_map[gy][gx]
-                        ch, num = get_tile_char_num(tile)
-                        selected_tile = ch
-                        pending_value = num if num else ""
-                        if ch in tile_keys:
-                            selected_index = tile_keys.index(ch)
+                    tile = tile_map.get(gx, gy)
+                    ch, num = get_tile_char_num(tile)
+                    selected_tile = ch
+                    pending_value = num if num else ""
+                    if ch in tile_keys:
+                        selected_index = tile_keys.index(ch)
                     continue
 
                 # Switch tile
@@ -485,29 +934,24 @@ def main_loop():
                     pending_value = ""
                     continue
 
-                # Pan: WASD / Arrows (can go negative to expand top/left)
+                # Pan: WASD / Arrows (the map has no edges)
                 if event.key in (pygame.K_w, pygame.K_UP):
                     offset_y -= 1
-                    ensure_view_within_map()
                     continue
                 if event.key in (pygame.K_s, pygame.K_DOWN):
                     offset_y += 1
-                    ensure_view_within_map()
                     continue
                 if event.key in (pygame.K_a, pygame.K_LEFT):
                     offset_x -= 1
-                    ensure_view_within_map()
                     continue
                 if event.key in (pygame.K_d, pygame.K_RIGHT):
                     offset_x += 1
-                    ensure_view_within_map()
                     continue
 
-                # Quick expand top-left (Q)
+                # Quick pan up-left (Q)
                 if event.key == pygame.K_q:
                     offset_x -= 4
                     offset_y -= 4
-                    ensure_view_within_map()
                     continue
 
                 # Numeric input for -1 tiles
@@ -522,78 +966,19 @@ def main_loop():
                 if event.key == pygame.K_z:
                     TILE_SIZE = min(96, TILE_SIZE + 4)
                     recalc_view_counts_from_window()
-                    clear_image_cache()
                     continue
                 if event.key == pygame.K_x:
                     TILE_SIZE = max(8, TILE_SIZE - 4)
                     recalc_view_counts_from_window()
-                    clear_image_cache()
                     continue
 
-        # DRAW
-        screen.fill((12,12,12))
-
-        # draw tiles viewport
-        for vy in range(VIEW_HEIGHT):
-            for vx in range(VIEW_WIDTH):
-                gx = vx + offset_x
-                gy = vy + offset_y
-                rect = pygame.Rect(vx*TILE_SIZE, vy*TILE_SIZE, TILE_SIZE, TILE_SIZE)
-
-                if 0 <= gx < MAP_WIDTH and 0 <= gy < MAP_HEIGHT:
-                    tile = tile_map[gy][gx]
-                    ch, num = get_tile_char_num(tile)
-                    img = load_tile_image(ch, num, TILE_SIZE)
-                    # draw image or error rect
-                    if img:
-                        screen.blit(img, rect.topleft)
-                    else:
-                        # should not happen because loader returns error texture, but safe fallback
-                        pygame.draw.rect(screen, (255,0,255), rect)
-
-                    stroke = max(1, TILE_SIZE // 16)
-                    pygame.draw.rect(screen, (40,40,40), rect, stroke)
-
-                    # draw number always if present
-                    if num is not None:
-                        font_size = max(10, TILE_SIZE // 2)
-                        num_font = pygame.font.SysFont(None, font_size)
-                        num_surf = num_font.render(str(num), True, (255,255,255))
-                        # small shadow
-                        screen.blit(num_surf, (vx*TILE_SIZE + 2, vy*TILE_SIZE + 2))
-                else:
-                    # area outside map (expansion should prevent this normally)
-                    pygame.draw.rect(screen, (20,20,20), rect)
-                    pygame.draw.rect(screen, (40,40,40), rect, 1)
-
-        # bottom UI panel
-        ui_rect = pygame.Rect(0, SCREEN_HEIGHT - UI_PANEL_HEIGHT, SCREEN_WIDTH, UI_PANEL_HEIGHT)
-        pygame.draw.rect(screen, (18,18,18), ui_rect)
-
-        # info + instructions
-        used_bbox = compute_used_bbox()
-        used_w = used_h = 0
-        if used_bbox:
-            used_w = used_bbox[2] - used_bbox[0] + 1
-            used_h = used_bbox[3] - used_bbox[1] + 1
-
-        info = f"Tile: {selected_tile}{('' if not pending_value else pending_value)}   Used W,H: {used_w},{used_h}   Map size: {MAP_WIDTH}x{MAP_HEIGHT}   Offset: {offset_x},{offset_y}   Tile size: {TILE_SIZE}px"
-        instructions = "Arrows / WASD: pan | Left/Right: switch tile | E: eyedropper | Shift+S: save | Shift+L: load | Z/X: zoom | Q: quick expand top-left"
-        help_text = info + "    " + instructions
-        max_text_w = SCREEN_WIDTH - 16
-
-        wrapped = wrap_text_lines(help_text, base_font, max_text_w)
-        text_y = SCREEN_HEIGHT - UI_PANEL_HEIGHT + 6
-        for line in wrapped:
-            surf = base_font.render(line, True, (220,220,220))
-            screen.blit(surf, (8, text_y))
-            text_y += base_font.get_linesize()
-
-        pygame.display.flip()
+        draw_frame()
         clock.tick(60)
 
     pygame.quit()
     sys.exit(0)
 
 if __name__ == "__main__":
+    if os.path.exists(MAP_FILE):
+        load_map_text()
     main_loop()
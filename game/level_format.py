@@ -0,0 +1,171 @@
+# level_format.py
+"""
+The level file format, shared by the game (game.py), the editor
+(level_editor.py) and the batch tool (level_batch.py).
+
+    width = W
+    height = H
+    <H rows of W tiles>
+    <optional chest table rows>
+
+A tile is one character followed by an optional number ("#1", "^0100",
+"-"). Characters whose basic_tiles code is -1 must carry a number; those
+with -2 never do.
+"""
+import re
+from collections import namedtuple
+
+basic_tiles = { #ints are only used for the special code
+    "-":[0,-2],  #empty Space
+    "#":[1,-1],  #wall
+    " ":[2,-1],  #basic floor
+    "*":[3, -2], #player
+    "=":[9,-1],  #door, disappears if they have the key for it
+    "<":[8,-1],  #keycard for the door
+    "?":[7,-1],  #special interactable, do a function call
+    "E":[0,-1],  #enemy type
+    "^":[11,-1],  #staircase up
+    "v":[12,-1],  #staircase down
+    "@":[13,-1],  #starts from staircases
+    "c":[21,-1],  #chest, refers to chest table
+    "p":[22,-1]  #powerup
+}
+
+#  '#' 0 = concrete   1 = wood
+#  ' ' 0 = concrete   1 = wood    2 = carpet   3 = tile
+#  for staircases - -x-y x = level y = door  0001
+#  each staircase must have a corresponding start on the given level
+#        00 01 staircase, floor 00, there must be a start 01
+
+TOKEN_RE = re.compile(r".\d*")   # one character, followed by zero or more digits
+EMPTY = "-"
+
+LevelText = namedtuple("LevelText", "width height rows extra")
+
+
+def decode_tiles(line):
+    """Split one row into tile tokens. Only the line ending is dropped: ' ' is a tile."""
+    return TOKEN_RE.findall(line.rstrip("\r\n"))
+
+
+def parse_header_value(line, name):
+    """N from a 'name = N' header line, or None if the line is not one."""
+    key, sep, value = line.partition("=")
+    if not sep or key.strip() != name:
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+
+def parse_level_text(text):
+    """
+    Parse a level file's text. width/height are None when their header line
+    is missing; rows are the first height lines as lists of tokens and
+    extra the tokenized lines after them (the chest table).
+    """
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()  # trailing newline
+    width = height = None
+    idx = 0
+    for name in ("width", "height"):
+        if idx < len(lines):
+            value = parse_header_value(lines[idx], name)
+            if value is not None:
+                if name == "width":
+                    width = value
+                else:
+                    height = value
+                idx += 1
+    body = [decode_tiles(line) for line in lines[idx:]]
+    split = len(body) if height is None else height
+    return LevelText(width, height, body[:split], body[split:])
+
+
+def check_tile(token):
+    """Reason token is not a valid tile, or None."""
+    ch, num = token[0], token[1:]
+    if ch not in basic_tiles:
+        return f"unknown tile {ch!r}"
+    if basic_tiles[ch][1] == -1 and not num:
+        return f"{ch!r} needs a number"
+    if basic_tiles[ch][1] == -2 and num:
+        return f"{ch!r} takes no number"
+    return None
+
+
+def normalize_tile(token):
+    """token with a missing number filled in as 0 and a stray number dropped."""
+    ch = token[0]
+    code = basic_tiles.get(ch, [0, 0])[1]
+    if code == -1 and len(token) == 1:
+        return ch + "0"
+    if code == -2 and len(token) > 1:
+        return ch
+    return token
+
+
+def validate(level):
+    """List of problems with a parsed level (empty if it is well formed)."""
+    problems = []
+    if level.width is None:
+        problems.append("missing 'width = N' header")
+    if level.height is None:
+        problems.append("missing 'height = N' header")
+    if level.height is not None and len(level.rows) < level.height:
+        problems.append(f"height = {level.height} but only {len(level.rows)} rows")
+    # A level uses a handful of distinct tokens: check those, then only
+    # walk the rows that contain a bad one
+    bad = {t: reason for t in set().union(*level.rows) if (reason := check_tile(t))}
+    for y, row in enumerate(level.rows):
+        if level.width is not None and len(row) != level.width:
+            problems.append(f"row {y}: {len(row)} tiles, width = {level.width}")
+        if bad and not bad.keys().isdisjoint(row):
+            for x, token in enumerate(row):
+                if token in bad:
+                    problems.append(f"row {y} col {x}: {bad[token]} ({token!r})")
+    return problems
+
+
+def normalize(level):
+    """
+    Canonical LevelText: header filled in from the rows if missing, rows
+    padded with empty tiles (or cut) to width, numbers made explicit.
+    The chest table is kept as is.
+    """
+    width = level.width if level.width is not None else max((len(r) for r in level.rows), default=0)
+    height = level.height if level.height is not None else len(level.rows)
+    fixes = {t: fixed for t in set().union(*level.rows) if (fixed := normalize_tile(t)) != t}
+    rows = []
+    for y in range(height):
+        row = level.rows[y][:width] if y < len(level.rows) else []
+        if fixes and not fixes.keys().isdisjoint(row):
+            row = [fixes.get(t, t) for t in row]
+        row += [EMPTY] * (width - len(row))
+        rows.append(row)
+    return LevelText(width, height, rows, level.extra)
+
+
+def format_level(level):
+    """Level text in the format read_level and make_grid expect."""
+    out = [f"width = {level.width}", f"height = {level.height}"]
+    out.extend("".join(row) for row in level.rows)
+    out.extend("".join(row) for row in level.extra)
+    return "\n".join(out) + "\n"
+
+
+# --- Editor tiles ---
+# The editor keeps numbered tiles as "ch:num" so the number can be edited
+# separately from the character.
+def to_editor_tile(token):
+    return f"{token[0]}:{token[1:]}" if len(token) > 1 else token
+
+
+def from_editor_tile(tile):
+    """File token for an editor tile; numbered tiles without a number get 0."""
+    if ":" in tile:
+        ch, num = tile.split(":", 1)
+        return f"{ch}{num}"
+    return normalize_tile(tile)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Offline campaign checker and solver for assets/levels.
+
+Loads every level_N.txt through make_grid (so tiles mean exactly what they
+mean in game_logic), reports broken links (stairs to missing levels, stair
+codes with no matching '@', doors whose key exists nowhere) and searches
+for the shortest route from the start of level_0 to the exit '^' on the
+final floor.
+
+The search is Dijkstra over (floor, position, key bitset), where each edge
+is one flood fill of a floor: from where you stand, how many moves to
+every key you do not have yet and every stair. Flood fills are memoized
+per (floor, start, keys that matter on that floor), so the many key sets
+that look identical to a floor share one fill.
+
+    python level_solver.py            # report + shortest route summary
+    python level_solver.py --moves    # also print the route as w/a/s/d
+    python level_solver.py --verify   # replay the route through move_player
+"""
+import argparse
+import contextlib
+import heapq
+import io
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(__file__))
+import game_logic
+import game_state as GS
+from game import make_grid, level_path_for
+from game_logic import FINAL_FLOOR
+
+STEPS = (("w", 0, -1), ("a", -1, 0), ("s", 0, 1), ("d", 1, 0))
+
+
+class Floor:
+    def __init__(self, number, level):
+        w, h, vg, ct, grid, pos = level
+        self.number = number
+        self.w, self.h = w, h
+        self.start = pos
+        self.chars = [[grid[y][x][:1] for x in range(w)] for y in range(h)]
+        self.vals = [[vg[y][x][1] if isinstance(vg[y][x], (list, tuple)) else None
+                      for x in range(w)] for y in range(h)]
+        self.arrivals = {}          # '@' code -> first matching cell (row-major, like load_level)
+        self.doors = {}             # cell -> key id
+        self.keys = {}              # cell -> key id
+        self.stairs = {}            # cell -> stair code
+        for y in range(h):
+            for x in range(w):
+                ch, val = self.chars[y][x], self.vals[y][x]
+                if ch == "@":
+                    self.arrivals.setdefault(int(val), (x, y))
+                elif ch == "=":
+                    self.doors[(x, y)] = val
+                elif ch == "<":
+                    self.keys[(x, y)] = val
+                elif ch in ("^", "v"):
+                    self.stairs[(x, y)] = val
+
+
+class Campaign:
+    def __init__(self):
+        self.floors = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            while os.path.exists(level_path_for(f"level_{len(self.floors)}.txt")):
+                n = len(self.floors)
+                self.floors.append(Floor(n, make_grid(f"level_{n}.txt")))
+        key_ids = sorted({k for f in self.floors for k in list(f.doors.values()) + list(f.keys.values())},
+                         key=str)
+        self.bit = {k: 1 << i for i, k in enumerate(key_ids)}
+        # keys that change what a flood fill of each floor can do
+        self.relevant = [sum({self.bit[k] for k in list(f.doors.values()) + list(f.keys.values())})
+                         for f in self.floors]
+        self.problems = self._check()
+        self._fills = {}
+
+    def _check(self):
+        problems = []
+        have_keys = {k for f in self.floors for k in f.keys.values()}
+        for f in self.floors:
+            for (x, y), code in sorted(f.stairs.items()):
+                ch = f.chars[y][x]
+                if (ch == "^" and f.number == FINAL_FLOOR) or (ch == "v" and f.number == 0):
+                    continue
+                target, arrive = code // 100, code % 100
+                if target >= len(self.floors):
+                    problems.append(f"floor {f.number} ({x},{y}): '{ch}{code:04d}' leads to missing level_{target}.txt")
+                elif arrive not in self.floors[target].arrivals:
+                    problems.append(f"floor {f.number} ({x},{y}): '{ch}{code:04d}' has no '@{arrive:02d}' "
+                                    f"on floor {target} (player would land at {self.floors[target].start})")
+            for (x, y), key in sorted(f.doors.items()):
+                if key not in have_keys:
+                    problems.append(f"floor {f.number} ({x},{y}): door '={key}' has no matching key anywhere")
+        return problems
+
+    def stair_target(self, floor, cell):
+        """(floor, cell) a stair leads to, 'exit' for the final '^', None if it does nothing."""
+        f = self.floors[floor]
+        x, y = cell
+        ch, code = f.chars[y][x], f.stairs[cell]
+        if ch == "^" and floor == FINAL_FLOOR:
+            return "exit"
+        if ch == "v" and floor == 0:
+            return None
+        target = code // 100
+        if target >= len(self.floors):
+            return None  # load_level would fail; treat as a dead end
+        tf = self.floors[target]
+        return target, tf.arrivals.get(code % 100, tf.start)
+
+    def fill(self, floor, start, keys):
+        """
+        Flood fill floor from start holding keys. Returns (events, parents):
+        events maps each key cell (not yet held) and stair cell reachable to
+        its distance in moves; parents reconstructs paths.
+        """
+        memo_key = (floor, start, keys & self.relevant[floor])
+        hit = self._fills.get(memo_key)
+        if hit is not None:
+            return hit
+
+        f = self.floors[floor]
+        chars, bit = f.chars, self.bit
+        dist = {start: 0}
+        parents = {start: None}
+        events = {}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            d = dist[cell] + 1
+            x, y = cell
+            for move, dx, dy in STEPS:
+                nx, ny = x + dx, y + dy
+                nxt = (nx, ny)
+                if nxt in dist or not (0 <= nx < f.w and 0 <= ny < f.h):
+                    continue
+                ch = chars[ny][nx]
+                if ch in game_logic.basic_solid:
+                    continue
+                if ch == "=" and not keys & bit[f.doors[nxt]]:
+                    continue
+                dist[nxt] = d
+                parents[nxt] = (cell, move)
+                if ch in ("^", "v") or (ch == "<" and not keys & bit[f.keys[nxt]]):
+                    events[nxt] = d     # stepping here changes floor or keys: stop
+                else:
+                    queue.append(nxt)
+        self._fills[memo_key] = (events, parents)
+        return events, parents
+
+    def solve(self):
+        """
+        Shortest route to the exit. Returns (total moves, legs) where each
+        leg is (floor, from cell, keys held, to cell), or (None, reached)
+        with the set of floors reached if the exit is unreachable.
+        """
+        start = (0, self.floors[0].start, 0)
+        best = {start: 0}
+        prev = {start: None}
+        heap = [(0, 0, start)]
+        counter = 1
+        reached = set()
+        while heap:
+            cost, _, node = heapq.heappop(heap)
+            if cost > best.get(node, cost):
+                continue
+            floor, cell, keys = node
+            reached.add(floor)
+            events, _ = self.fill(floor, cell, keys)
+            for target_cell, d in events.items():
+                ch = self.floors[floor].chars[target_cell[1]][target_cell[0]]
+                if ch == "<":
+                    nxt = (floor, target_cell, keys | self.bit[self.floors[floor].keys[target_cell]])
+                else:
+                    dest = self.stair_target(floor, target_cell)
+                    if dest is None:
+                        continue
+                    if dest == "exit":
+                        nxt = ("exit", None, 0)
+                    else:
+                        nxt = (dest[0], dest[1], keys)
+                new_cost = cost + d
+                if new_cost < best.get(nxt, float("inf")):
+                    best[nxt] = new_cost
+                    prev[nxt] = (node, target_cell)
+                    if nxt[0] == "exit":
+                        continue
+                    heapq.heappush(heap, (new_cost, counter, nxt))
+                    counter += 1
+
+        goal = ("exit", None, 0)
+        if goal not in best:
+            return None, reached
+        legs = []
+        node = goal
+        while prev[node] is not None:
+            parent, target_cell = prev[node]
+            legs.append((parent[0], parent[1], parent[2], target_cell))
+            node = parent
+        legs.reverse()
+        return best[goal], legs
+
+    def moves_for(self, legs):
+        """The route as a string of w/a/s/d."""
+        out = []
+        for floor, start, keys, target in legs:
+            _, parents = self.fill(floor, start, keys)
+            path = []
+            cell = target
+            while parents[cell] is not None:
+                cell, move = parents[cell]
+                path.append(move)
+            out.extend(reversed(path))
+        return "".join(out)
+
+    def describe(self, keys):
+        return ",".join(str(k) for k, b in self.bit.items() if keys & b) or "none"
+
+
+def verify_route(moves):
+    """Play moves through move_player from a fresh game; True if it ends the game."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        game_logic.start_game("level_0.txt")
+        for mv in moves:
+            game_logic.move_player(mv)
+    return GS.game_complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", action="store_true", help="print the route as w/a/s/d")
+    parser.add_argument("--verify", action="store_true", help="replay the route through move_player")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    camp = Campaign()
+    total, legs = camp.solve()
+    elapsed = time.perf_counter() - t0
+
+    print(f"{len(camp.floors)} floors, {len(camp.bit)} key ids, solved in {elapsed * 1000:.1f} ms "
+          f"({len(camp._fills)} floor fills)")
+    for p in camp.problems:
+        print("  ✗", p)
+
+    if total is None:
+        print(f"✗ exit on floor {FINAL_FLOOR} is NOT reachable (floors reached: {sorted(legs)})")
+        sys.exit(1)
+
+    print(f"✓ exit reachable in {total} moves:")
+    for floor, start, keys, target in legs:
+        f = camp.floors[floor]
+        ch = f.chars[target[1]][target[0]]
+        what = {"<": f"pick up key {f.keys.get(target)}", "^": "take stairs up", "v": "take stairs down"}[ch]
+        print(f"  floor {floor}: {start} -> {target} {what} (holding keys: {camp.describe(keys)})")
+
+    moves = camp.moves_for(legs)
+    if args.moves:
+        print(moves)
+    if args.verify:
+        ok = verify_route(moves)
+        print("✓ route completes the game in move_player" if ok else "✗ route does NOT complete the game in move_player")
+        if not ok:
+            sys.exit(1)
+    sys.exit(1 if camp.problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# level_watch.py
+"""
+Hot reload for level files.
+
+A background thread polls the modification time of every level in
+game.LEVEL_CACHE. When a file changes it is re-read with read_level(),
+which decodes only the rows whose text changed, checked, and swapped into
+the cache in one dict assignment. Sessions already playing keep the grid
+they loaded; new sessions and later floor loads get the new version.
+A file that fails to parse (e.g. caught half-written) is left as it was
+and retried on its next change.
+"""
+import os
+import threading
+
+import game
+
+POLL_INTERVAL = 0.5   # seconds between mtime checks
+LEVEL_HOT_RELOAD = os.environ.get("LEVEL_HOT_RELOAD", "1") != "0"
+
+
+def check_level(level):
+    """Return a reason the parsed level is unusable, or None if it is fine."""
+    if len(level.rows) < level.height:
+        return f"{len(level.rows)} rows but height = {level.height}"
+    for y, row in enumerate(level.rows):
+        if len(row) < level.width:
+            return f"row {y} has {len(row)} tiles but width = {level.width}"
+    return None
+
+
+class LevelWatcher(threading.Thread):
+    def __init__(self, interval=POLL_INTERVAL):
+        super().__init__(daemon=True, name="level-watcher")
+        self.interval = interval
+        self.reloads = 0
+        self._failed = {}   # path -> mtime we could not parse
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def poll(self):
+        for path, level in list(game.LEVEL_CACHE.items()):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue  # deleted or mid-rename; keep serving the cached copy
+            if mtime == level.mtime or self._failed.get(path) == mtime:
+                continue
+            self.reload(path, level, mtime)
+
+    def reload(self, path, old, mtime):
+        name = os.path.basename(path)
+        try:
+            new = game.read_level(path, previous=old)
+            problem = check_level(new)
+        except (OSError, ValueError, IndexError) as e:
+            problem = str(e)
+        if problem:
+            self._failed[path] = mtime
+            print(f"[level_watch] keeping old {name}: {problem}")
+            return
+        self._failed.pop(path, None)
+        game.LEVEL_CACHE[path] = new
+        self.reloads += 1
+        changed = sum(1 for a, b in zip(old.lines, new.lines) if a != b) + abs(len(new.lines) - len(old.lines))
+        print(f"[level_watch] reloaded {name} ({new.width}x{new.height}, {changed} changed rows)")
@@ -0,0 +1,173 @@
+# metrics.py
+"""
+Lightweight in-process metrics for the game server.
+
+Counters, gauges and fixed-bucket histograms cost a few attribute updates
+per observation, so they are always on. All observations happen on the
+WebSocket thread; the Flask thread only reads them through snapshot(), so
+no locking is needed (a snapshot may be a tick out of date, nothing more).
+Other threads must hand their updates to the loop with
+loop.call_soon_threadsafe, as the watchdog's monitor does.
+"""
+import functools
+import time
+from bisect import bisect_left
+
+RATE_WINDOW = 5.0            # seconds a Counter's rate is averaged over
+
+# Bucket upper bounds
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+SIZE_BUCKETS = [256, 1024, 4096, 8192, 16384, 32768, 65536, 131072, 262144]
+DEPTH_BUCKETS = [0, 1, 2, 3, 4, 8, 16]
+
+START_TIME = time.time()
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._rate = 0.0
+
+    def inc(self, n=1):
+        self.value += n
+        now = time.monotonic()
+        if now - self._window_start >= RATE_WINDOW:
+            self._rate = self._window_count / (now - self._window_start)
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += n
+
+    def rate(self):
+        """Events per second over the last full window."""
+        if time.monotonic() - self._window_start >= 2 * RATE_WINDOW:
+            return 0.0  # nothing happened for a whole window
+        return self._rate
+
+    def snapshot(self):
+        return {"total": self.value, "per_sec": round(self.rate(), 2)}
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, v):
+        self.value = v
+
+    def inc(self, n=1):
+        self.value += n
+
+    def dec(self, n=1):
+        self.value -= n
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is overflow
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, v):
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "buckets": list(zip(self.buckets + ["+Inf"], self.counts)),  # (upper bound, count)
+        }
+
+
+def timed(hist):
+    """Decorator that observes each call's duration into hist."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        return inner
+    return wrap
+
+
+# ============================================================
+#  SERVER METRICS
+# ============================================================
+active_sessions = Gauge()
+active_rooms = Gauge()
+sessions_total = Counter()
+moves_processed = Counter()
+moves_rejected = Counter()       # malformed or over the rate limit
+frames_sent = Counter()
+frames_dropped = Counter()       # coalesced away by the outbound queue
+slow_disconnects = Counter()
+loop_stalls = Counter()          # reported by the watchdog
+timers_pending = Gauge()         # scheduled on the timer wheel
+timers_fired = Counter()
+floor_loads = Counter()          # built in load_level
+floor_loads_prepared = Counter() # prepared near the stairs, swapped in
+
+move_latency = Histogram(LATENCY_BUCKETS)        # seconds in move_player
+load_level_time = Histogram(LATENCY_BUCKETS)     # seconds in load_level
+frame_bytes = Histogram(SIZE_BUCKETS)            # serialized state frame size
+send_queue_depth = Histogram(DEPTH_BUCKETS)      # frames waiting when a new one is queued
+loop_lag = Histogram(LATENCY_BUCKETS)            # event-loop scheduling delay
+
+REGISTRY = {
+    "active_sessions": active_sessions,
+    "active_rooms": active_rooms,
+    "sessions_total": sessions_total,
+    "moves_processed": moves_processed,
+    "moves_rejected": moves_rejected,
+    "frames_sent": frames_sent,
+    "frames_dropped": frames_dropped,
+    "slow_disconnects": slow_disconnects,
+    "loop_stalls": loop_stalls,
+    "timers_pending": timers_pending,
+    "timers_fired": timers_fired,
+    "floor_loads": floor_loads,
+    "floor_loads_prepared": floor_loads_prepared,
+    "move_latency_seconds": move_latency,
+    "load_level_seconds": load_level_time,
+    "frame_bytes": frame_bytes,
+    "send_queue_depth": send_queue_depth,
+    "loop_lag_seconds": loop_lag,
+}
+
+
+def snapshot():
+    out = {"uptime_seconds": round(time.time() - START_TIME, 1)}
+    for name, metric in REGISTRY.items():
+        out[name] = metric.snapshot()
+    return out
+
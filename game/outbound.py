@@ -0,0 +1,119 @@
+# outbound.py
+"""
+Per-client outbound frame queue.
+
+Every state frame is a full snapshot of the game, so once a newer frame is
+queued any older unsent one is stale and can be dropped. Frames that carry a
+one-shot message (or the game-complete flag) are kept until sent so the
+player still sees them; a client with a full queue of those is stalled at
+once rather than losing one. A client that stays behind for too
+long is reported as stalled so the handler can disconnect it instead of
+buffering for it.
+
+The frame itself is shared by every subscriber of a room. A player's move
+ack rides along with it in the queue and goes out as its own small
+{"ack": N} message just before the frame, and only when it has changed.
+"""
+import asyncio
+import time
+from collections import deque
+
+import websockets
+
+import metrics
+import tracing
+
+SEND_QUEUE_SIZE = 4         # max frames buffered per client
+SEND_TIMEOUT = 2.0          # seconds a single ws.send() may take
+SLOW_CLIENT_TIMEOUT = 5.0   # seconds a client may stay behind before it is dropped
+
+
+class OutboundQueue:
+    def __init__(self, maxsize=SEND_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.frames = deque()   # (frame, important, ack or None)
+        self.ack_queued = None  # last ack handed to put()
+        self.dropped = 0
+        self.behind_since = None
+        self.overflowed = False  # the queue filled up with important frames
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put(self, frame, important=False, ack=None):
+        """Queue a frame, coalescing away any stale snapshots still waiting."""
+        metrics.send_queue_depth.observe(len(self.frames))
+        if ack == self.ack_queued:
+            ack = None
+        elif ack is not None:
+            self.ack_queued = ack
+        if self.frames:
+            # client has not caught up with the previous tick
+            if self.behind_since is None:
+                self.behind_since = time.monotonic()
+            carried = None
+            kept = deque()
+            for f in self.frames:
+                if f[1]:
+                    kept.append(f)
+                elif f[2] is not None:
+                    carried = f[2]  # not sent yet: goes out with this frame instead
+            self._drop(len(self.frames) - len(kept))
+            self.frames = kept
+            if ack is None:
+                ack = carried
+
+        if len(self.frames) >= self.maxsize:
+            # Only important frames are left: never drop one, give up on the client
+            self.overflowed = True
+            if not important:
+                self._drop(1)
+                return
+
+        self.frames.append((frame, important, ack))
+        self._ready.set()
+
+    def _drop(self, n):
+        if n:
+            self.dropped += n
+            metrics.frames_dropped.inc(n)
+
+    async def get(self):
+        """Wait for the next frame (or the ack that goes just before it) to send."""
+        while not self.frames:
+            self._ready.clear()
+            await self._ready.wait()
+        frame, important, ack = self.frames[0]
+        if ack is not None:
+            self.frames[0] = (frame, important, None)
+            return f'{{"ack":{ack}}}'
+        frame, _, _ = self.frames.popleft()
+        if not self.frames:
+            self.behind_since = None
+        return frame
+
+    def is_stalled(self, now=None):
+        if self.overflowed:
+            return True
+        if self.behind_since is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.behind_since > SLOW_CLIENT_TIMEOUT
+
+
+async def send_frames(ws, outbox):
+    """Drain outbox into ws; a send that takes too long closes the connection."""
+    while True:
+        frame = await outbox.get()
+        try:
+            with tracing.span("ws.send", bytes=len(frame)):
+                await asyncio.wait_for(ws.send(frame), timeout=SEND_TIMEOUT)
+            metrics.frames_sent.inc()
+        except asyncio.TimeoutError:
+            print("[send_frames] send timed out, closing slow client")
+            metrics.slow_disconnects.inc()
+            await ws.close(1013, "client too slow")
+            return
+        except websockets.exceptions.ConnectionClosed:
+            return
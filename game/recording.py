@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Session move recording and deterministic replay.
+
+With RECORD_SESSIONS=1 every room records the moves it applies, in
+order, to recordings/<room>-<time>.rec (RECORD_DIR). Recording is off by
+default: nothing rotates or prunes these files.
+
+    EMUREC1\\n
+    {"level": "level_0.txt", "room": ..., "started": ...}\\n    JSON header line
+    <move byte><varint ms since previous move>                 one per move
+    0xFF {"floor": ..., "player": ..., ...}\\n                  final state
+
+Move bytes index into MOVES ("wasd"). Replaying starts a fresh game on the
+header's level and feeds the moves through move_player with no sleeping
+and no printing, then compares the final state with the one recorded.
+
+    python recording.py replay recordings/*.rec
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from game_logic import move_player, start_game, state_summary
+
+MAGIC = b"EMUREC1\n"
+MOVES = "wasd"
+MOVE_CODES = {m: i for i, m in enumerate(MOVES)}
+END = 0xFF
+
+RECORD_SESSIONS = os.environ.get("RECORD_SESSIONS", "0") == "1"
+RECORD_DIR = os.environ.get(
+    "RECORD_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "recordings"))
+
+
+def encode_varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def decode_varint(data, pos):
+    """(value, position after it) of the varint at data[pos], or None if data ends inside it."""
+    value = shift = 0
+    while pos < len(data):
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+    return None
+
+
+class Recorder:
+    def __init__(self, path, level, **header):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.moves = 0
+        self._f = open(path, "wb")  # buffered: a move costs a memcpy, not a syscall
+        self._f.write(MAGIC)
+        self._f.write(json.dumps({"level": level, "started": time.time(), **header}).encode() + b"\n")
+        self._start = time.monotonic()
+        self._last_ms = 0
+
+    def record(self, direction):
+        now_ms = int((time.monotonic() - self._start) * 1000)
+        self._f.write(bytes((MOVE_CODES[direction],)) + encode_varint(now_ms - self._last_ms))
+        self._last_ms = now_ms
+        self.moves += 1
+
+    def close(self, final=None):
+        if self._f.closed:
+            return
+        self._f.write(bytes((END,)) + json.dumps(final).encode() + b"\n")
+        self._f.close()
+
+
+def open_recorder(room_name, level):
+    """Recorder for a new room, or None if recording is switched off."""
+    if not RECORD_SESSIONS:
+        return None
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in room_name)
+    path = os.path.join(RECORD_DIR, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}.rec")
+    return Recorder(path, level, room=room_name)
+
+
+def read_recording(path):
+    """
+    Return (header, moves, deltas_ms, final) from a .rec file. A file cut
+    off part way (the server died before close) gives the moves up to the
+    last complete one and final None.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a recording")
+    pos = data.find(b"\n", len(MAGIC)) + 1
+    if not pos:
+        raise ValueError(f"{path}: header cut off")
+    header = json.loads(data[len(MAGIC):pos])
+
+    moves = []
+    deltas = []
+    final = None
+    n = len(data)
+    while pos < n:
+        code = data[pos]
+        if code == END:
+            end = data.find(b"\n", pos)
+            if end != -1:  # otherwise the final state was cut off mid-line
+                final = json.loads(data[pos + 1:end])
+            break
+        if code >= len(MOVES):
+            raise ValueError(f"{path}: bad move byte {code} at offset {pos}")
+        decoded = decode_varint(data, pos + 1)
+        if decoded is None:
+            break  # cut off mid-move
+        delta, pos = decoded
+        moves.append(MOVES[code])
+        deltas.append(delta)
+    return header, moves, deltas, final
+
+
+def replay(path):
+    """
+    Re-run a recording through move_player. Returns (moves, final state,
+    recorded final state or None if the session never closed cleanly).
+    """
+    header, moves, deltas, recorded = read_recording(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_game(header["level"])
+        for direction in moves:
+            move_player(direction)
+    return moves, deltas, state_summary(), recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("replay", help="replay recordings and check they reproduce")
+    rp.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    total_moves = 0
+    total_real = 0.0
+    mismatches = 0
+    start = time.perf_counter()
+    for path in args.files:
+        t0 = time.perf_counter()
+        try:
+            moves, deltas, final, recorded = replay(path)
+        except (OSError, ValueError) as e:
+            print(f"{os.path.basename(path)}: ✗ unreadable: {e}")
+            mismatches += 1
+            continue
+        took = time.perf_counter() - t0
+        real = sum(deltas) / 1000
+        total_moves += len(moves)
+        total_real += real
+        if recorded is None:
+            status = "? no final state recorded (cut off: the session never closed)"
+        elif recorded == final:
+            status = "✓ reproduced"
+        else:
+            status = f"✗ diverged: recorded {recorded}, replayed {final}"
+            mismatches += 1
+        print(f"{os.path.basename(path)}: {len(moves)} moves, {real:.1f}s played, "
+              f"replayed in {took * 1000:.1f} ms  {status}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.files)} recordings, {total_moves} moves in {elapsed:.2f}s "
+          f"({total_moves / elapsed if elapsed else 0:,.0f} moves/sec, "
+          f"{total_real / elapsed if elapsed else 0:,.0f}x real time)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# rooms.py
+"""
+Rooms: one game shared by any number of connections.
+
+Each room owns a GameSession and a tick task (run_room in server.py) that
+applies its players' moves, serializes the state once and fans the same
+frame out to every subscriber's outbound queue, so encoding cost is per
+room rather than per client. Spectators subscribe without an input queue;
+players also get their own move ack, as a separate message (see outbound.py).
+
+game_logic works on the module-level state in game_state (GS) and a few
+game_logic globals. A GameSession keeps its own copy of that state and
+swaps it in with active() for the duration of a synchronous step. Never
+await inside active(): another room may run in the meantime.
+"""
+import asyncio
+from contextlib import contextmanager
+
+import game_logic
+import game_state as GS
+from visibility import FovCache
+
+STATE_FIELDS = ("w", "h", "floor", "value_grid", "ct", "grid", "player_pos",
+                "basic_tiles", "message", "game_complete", "night", "replacement_floors")
+DEFAULT_STATE = {f: getattr(GS, f) for f in STATE_FIELDS}
+
+
+class GameSession:
+    def __init__(self):
+        self.state = dict(DEFAULT_STATE)
+        self.collectedKeys = set()
+        self.gridChanges = []
+        self.enemyStates = {}
+        self.preparedFloors = {}
+        self.fov = FovCache()       # not swapped into GS: serialize_state takes it directly
+
+    @contextmanager
+    def active(self):
+        """Make this session the one GS and game_logic operate on."""
+        for f, v in self.state.items():
+            setattr(GS, f, v)
+        game_logic.collectedKeys = self.collectedKeys
+        game_logic.gridChanges = self.gridChanges
+        game_logic.enemyStates = self.enemyStates
+        game_logic.preparedFloors = self.preparedFloors
+        try:
+            yield self
+        finally:
+            for f in STATE_FIELDS:
+                self.state[f] = getattr(GS, f)
+            self.collectedKeys = game_logic.collectedKeys
+            self.gridChanges = game_logic.gridChanges
+            self.enemyStates = game_logic.enemyStates
+            self.preparedFloors = game_logic.preparedFloors
+
+
+class Room:
+    def __init__(self, name):
+        self.name = name
+        self.game = GameSession()
+        self.players = {}           # OutboundQueue -> InputQueue, in join order
+        self.subscribers = set()    # OutboundQueues, players and spectators
+        self.preparing = {}         # floor -> Task building it ahead of the stairs
+        self.bad_levels = set()     # level files that failed to load, reported once
+        self.game_complete_sent = False  # game_complete in the last frame sent
+        self.input_ready = asyncio.Event()
+        self.task = None
+        self.recorder = None        # recording.Recorder while the room is open
+        self.timer = None           # pending floor/night Timer on the server's wheel
+
+    def broadcast(self, frame, important=False):
+        for outbox in self.subscribers:
+            inbox = self.players.get(outbox)
+            outbox.put(frame, important, None if inbox is None else inbox.acked)
+
+    def is_empty(self):
+        return not self.subscribers
+
+
+ROOMS = {}  # name -> Room
@@ -1,8 +1,13 @@
 import os
+import glob
 import json
+import time
+import functools
 import asyncio
+import threading
 import websockets
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, render_template, send_from_directory, jsonify, request, Response
+from markupsafe import Markup
 from threading import Thread
 
 # Import your game modules
@@ -11,6 +16,19 @@ sys.path.insert(0, os.path.dirname(__file__))
 from game import *
 from game_logic import *
 import game_state as GS  # <-- Use GS instead of globals
+import game_logic
+from outbound import OutboundQueue, send_frames
+from inbound import InputQueue, read_moves, MAX_MESSAGE_BYTES
+import metrics
+import tracing
+from watchdog import LoopWatchdog
+from rooms import Room, ROOMS
+from recording import open_recorder
+from level_watch import LevelWatcher, LEVEL_HOT_RELOAD
+from visibility import FovCache, DAY_RADIUS, NIGHT_RADIUS
+from timer_wheel import TimerWheel
+from build_assets import load_manifest, asset_url, background_css
+from urllib.parse import urlparse, parse_qs
 
 # --- Flask App Setup ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -20,6 +38,18 @@ app = Flask(
     static_folder=os.path.join(BASE_DIR, 'static')
 )
 
+# --- Optimized assets ---
+# Variants built by build_assets.py (read once at startup). Templates ask
+# for them through these helpers and fall back to the originals.
+ASSET_MANIFEST = load_manifest()
+
+@app.context_processor
+def asset_helpers():
+    return {
+        "asset_url": lambda name, kind=None, width=None: asset_url(ASSET_MANIFEST, name, kind, width),
+        "background_css": lambda selector, name: Markup(background_css(ASSET_MANIFEST, selector, name)),
+    }
+
 @app.route('/')
 @app.route('/index')
 @app.route('/index.html')
@@ -56,6 +86,82 @@ def serve_assets(filename):
     assets_dir = os.path.join(BASE_DIR, 'assets')
     return send_from_directory(assets_dir, filename)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return jsonify(metrics.snapshot())
+
+# --- Tracing / Profiling (toggle at runtime, e.g. curl -X POST .../trace/start?rate=0.1) ---
+# Only from the machine itself unless TRACE_CONTROL=1: the app listens on
+# every interface, and these routes write files and start threads
+TRACE_CONTROL = os.environ.get("TRACE_CONTROL", "0") == "1"
+TRACE_DIR = os.path.join(BASE_DIR, 'traces')
+MAX_TRACE_DUMPS = 20    # older dumps in TRACE_DIR are deleted
+LOOPBACK = ("127.0.0.1", "::1")
+profiler = None
+
+def trace_control(fn):
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        if not TRACE_CONTROL and request.remote_addr not in LOOPBACK:
+            return jsonify(error="tracing control is local only (set TRACE_CONTROL=1)"), 403
+        return fn(*args, **kwargs)
+    return inner
+
+def prune_trace_dumps():
+    dumps = sorted(glob.glob(os.path.join(TRACE_DIR, "trace-*.json")), key=os.path.getmtime)
+    for path in dumps[:-MAX_TRACE_DUMPS]:
+        os.remove(path)
+
+@app.route('/trace', methods=['GET'])
+def trace_status():
+    return jsonify(tracing.status())
+
+@app.route('/trace/start', methods=['POST'])
+@trace_control
+def trace_start():
+    tracing.start(request.args.get('rate', type=float))
+    return jsonify(tracing.status())
+
+@app.route('/trace/stop', methods=['POST'])
+@trace_control
+def trace_stop():
+    tracing.stop()
+    return jsonify(tracing.status())
+
+@app.route('/trace/dump', methods=['POST'])
+@trace_control
+def trace_dump():
+    path = os.path.join(TRACE_DIR, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+    count = tracing.dump(path)
+    prune_trace_dumps()
+    if request.args.get('clear'):
+        tracing.clear()
+    return jsonify(path=path, events=count)
+
+@app.route('/profile/start', methods=['POST'])
+@trace_control
+def profile_start():
+    global profiler
+    if ws_loop_thread_id is None:
+        return jsonify(error="websocket thread not running"), 409
+    if profiler is None:
+        interval = request.args.get('interval', type=float, default=tracing.PROFILE_INTERVAL)
+        profiler = tracing.SamplingProfiler(ws_loop_thread_id, interval)
+        profiler.start()
+    return jsonify(running=True, interval=profiler.interval)
+
+@app.route('/profile/stop', methods=['POST'])
+@trace_control
+def profile_stop():
+    """Stop the profiler and return its samples as folded stacks (flamegraph input)."""
+    global profiler
+    if profiler is None:
+        return jsonify(error="profiler not running"), 409
+    profiler.stop()
+    folded = profiler.folded()
+    profiler = None
+    return Response(folded + "\n", mimetype="text/plain")
+
 # --- Initialize Game State ---
 level_path = os.path.join(BASE_DIR, 'assets/levels/level_0.txt')
 
@@ -66,10 +172,7 @@ def initialize_game():
         if not os.path.exists(level_path):
             raise FileNotFoundError(f"Level file not found: {level_path}")
 
-        # Unpack returned values into GS
-        GS.w, GS.h, GS.value_grid, GS.ct, GS.grid, GS.player_pos = make_grid(level_path)
-        GS.floor = 0
-        reset() # Resets collected keys and grid changes (doors)
+        start_game(level_path)
 
         print(f"✓ Level loaded: {GS.w}x{GS.h}, player at {GS.player_pos}")
     except Exception as e:
@@ -91,51 +194,263 @@ def initialize_game():
 initialize_game()
 
 # --- Serialize GS for WebSocket ---
-def serialize_state():
+@tracing.traced()
+def serialize_state(fov=None):
+    """
+    State frame for the client. Only tiles the player can see are sent:
+    "grid" is the window at view.x/view.y with None for hidden tiles, and
+    view.w/view.h give the full floor size.
+    """
     msg = GS.message
     GS.message = None  # Clear message after sending
+    radius = NIGHT_RADIUS if GS.night else DAY_RADIUS
+    # gridChanges only grows when a door or key tile changes in place
+    x0, y0, window = (fov or FovCache()).window(GS.grid, GS.w, GS.h, GS.player_pos, radius,
+                                                len(game_logic.gridChanges))
     return {
-        "grid": GS.grid,
+        "grid": window,
+        "view": {"x": x0, "y": y0, "w": GS.w, "h": GS.h},
+        "floor": GS.floor,
+        "night": GS.night,
         "player": {"x": GS.player_pos[0], "y": GS.player_pos[1]},
         "basic_tiles": GS.basic_tiles,
         "message": msg,
         "game_complete": GS.game_complete
     }
 
-# --- WebSocket Handler ---
-async def handler(ws):
-    # Reset game state for this new connection
-    initialize_game()
-    print(f"New client connected, game reset to initial state")
-    
+# --- Rooms ---
+TICK_INTERVAL = 0.06  # seconds between state frames when no input arrives
+
+async def apply_move(room, direction, loop):
+    with room.game.active():
+        # A stair onto a level we have not parsed yet: read it in a
+        # worker thread rather than blocking every client
+        fname = uncached_stair_target(direction)
+        if not fname or fname in room.bad_levels:
+            floor = GS.floor
+            GS.player_pos = move_player(direction)  # move_player returns new pos
+            after_move(room, direction, floor)
+            return
+    try:
+        await loop.run_in_executor(None, prefetch_level, fname)
+    except (OSError, ValueError) as e:
+        # move_player's load_level fails on it too and the player stays put
+        report_bad_level(room, fname, e)
+    with room.game.active():
+        floor = GS.floor
+        GS.player_pos = move_player(direction)
+        after_move(room, direction, floor)
+
+def report_bad_level(room, fname, error):
+    """Log a level that cannot be read, once per room."""
+    if fname not in room.bad_levels:
+        room.bad_levels.add(fname)
+        print(f"[room {room.name}] cannot read {fname}: {error}")
+
+def after_move(room, direction, floor_before):
+    metrics.moves_processed.inc()
+    if room.recorder:
+        room.recorder.record(direction)
+    # Each floor gets its own countdown (a night already under way runs out first)
+    if GS.floor != floor_before and not GS.night:
+        arm_floor_timer(room)
+
+# --- Floor timers and night ---
+# One wheel for every room, driven by a single task in websocket_server.
+# Callbacks swap the room's game in, change it, and wake the room's tick
+# loop so the update goes out straight away.
+timers = TimerWheel()
+
+def arm_floor_timer(room):
+    """(Re)start the room's FLOOR_TIMER countdown."""
+    if room.timer:
+        room.timer.cancel()
+    room.timer = timers.schedule(FLOOR_TIMER, floor_time_up, room)
+
+def floor_time_up(room):
+    with room.game.active():
+        floor_time_is_up()
+        GS.night = True
+        GS.message = "Floor time is up! Night falls..."
+    room.timer = timers.schedule(NIGHT_DURATION, night_over, room)
+    room.input_ready.set()
+
+def night_over(room):
+    with room.game.active():
+        GS.night = False
+        GS.message = "The night is over."
+    arm_floor_timer(room)
+    room.input_ready.set()
+
+# --- Floors ahead ---
+# Near a stair the floor it leads to is built in a worker thread
+# (build_floor), so taking the stair is a swap of prepared state. Nothing
+# about it goes to the client before the player arrives (fog of war).
+PREFETCH_RADIUS = 4  # tiles from a stair
+
+def prepare_floors_near(room, loop):
+    with room.game.active():
+        wanted = {nf: floor_changes(nf) for nf in stairs_near(PREFETCH_RADIUS)
+                  if nf not in game_logic.preparedFloors and nf not in room.preparing
+                  and f"level_{nf}.txt" not in room.bad_levels}
+    for nf, changes in wanted.items():
+        room.preparing[nf] = asyncio.create_task(prepare_floor(room, nf, changes, loop))
+
+async def prepare_floor(room, nf, changes, loop):
+    try:
+        prepared = await loop.run_in_executor(None, build_floor, nf, changes)
+    except Exception as e:
+        report_bad_level(room, f"level_{nf}.txt", e)
+        return
+    finally:
+        room.preparing.pop(nf, None)
+    if room.game.state["floor"] == nf:
+        return  # took the stairs before it was ready
+    # No session is active across an await, so the room's own dict is the live one
+    room.game.preparedFloors[nf] = prepared
+
+async def run_room(room):
+    """Start a room's game and run its tick loop until the room closes."""
+    loop = asyncio.get_running_loop()
+    tracing.set_track(id(room), f"room {room.name}")
+
+    # Start a fresh game (level parsed off the loop)
+    await loop.run_in_executor(None, prefetch_level, level_path)
+    with room.game.active():
+        initialize_game()
+    # creating and closing the file (and its directory) happen in a worker thread
+    room.recorder = await loop.run_in_executor(None, open_recorder, room.name, os.path.basename(level_path))
+    arm_floor_timer(room)
+
+    try:
+        await tick_room(room, loop)
+    finally:
+        if room.timer:
+            room.timer.cancel()
+        if room.recorder:
+            with room.game.active():
+                final = state_summary()
+            await loop.run_in_executor(None, room.recorder.close, final)
+
+async def tick_room(room, loop):
+    """Each tick: apply queued moves, encode state once, fan it out."""
     while True:
+        room.input_ready.clear()
+        with tracing.span("tick", subscribers=len(room.subscribers)):
+            # Apply input from JS
+            moved = False
+            for inbox in list(room.players.values()):
+                for direction in inbox.drain():
+                    await apply_move(room, direction, loop)
+                    moved = True
+            if moved:
+                prepare_floors_near(room, loop)
+
+            # Encode game state once for every subscriber
+            with room.game.active():
+                state = serialize_state(room.game.fov)
+            with tracing.span("json.dumps"):
+                frame = json.dumps(state)
+            metrics.frame_bytes.observe(len(frame))
+            # A message is sent once (serialize_state clears it); game_complete
+            # stays set, so only the frame where it changes is important
+            room.broadcast(frame, important=bool(state["message"])
+                                            or state["game_complete"] != room.game_complete_sent)
+            room.game_complete_sent = state["game_complete"]
+
         try:
-            # Send game state
-            await ws.send(json.dumps(serialize_state()))
-
-            # Receive input from JS
-            try:
-                msg = await asyncio.wait_for(ws.recv(), timeout=0.03)
-            except asyncio.TimeoutError:
-                msg = None
-
-            if msg:
-                data = json.loads(msg)
-                direction = data.get("move")
-                if direction in ("w", "a", "s", "d"):
-                    GS.player_pos = move_player(direction)  # move_player returns new pos
-
-            await asyncio.sleep(0.03)
-        except websockets.exceptions.ConnectionClosed:
-            print("Client disconnected")
-            break
+            await asyncio.wait_for(room.input_ready.wait(), timeout=TICK_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+def join_room(name):
+    room = ROOMS.get(name)
+    if room is None:
+        room = ROOMS[name] = Room(name)
+        room.task = asyncio.create_task(run_room(room))
+        metrics.active_rooms.inc()
+        print(f"Room {name!r} created, game reset to initial state")
+    return room
+
+def leave_room(room, outbox):
+    room.subscribers.discard(outbox)
+    room.players.pop(outbox, None)
+    if room.is_empty():
+        room.task.cancel()
+        del ROOMS[room.name]
+        metrics.active_rooms.dec()
+        print(f"Room {room.name!r} closed")
+
+# --- WebSocket Handler ---
+STALL_CHECK_INTERVAL = 0.5  # seconds between slow-client checks
+
+def parse_connection(ws):
+    """
+    Room name and spectator flag from the request, e.g. ws://host:8765/?room=abc&spectate=1.
+    Without a room every connection gets a private game, as before.
+    """
+    query = parse_qs(urlparse(ws.request.path).query)
+    room = query.get("room", [""])[0] or f"solo-{id(ws)}"
+    spectate = query.get("spectate", ["0"])[0] not in ("", "0")
+    return room, spectate
+
+async def handler(ws):
+    room_name, spectate = parse_connection(ws)
+    room = join_room(room_name)
+    print(f"New {'spectator' if spectate else 'player'} connected to room {room_name!r}")
+    metrics.active_sessions.inc()
+    metrics.sessions_total.inc()
+
+    # Frames go through a bounded per-client queue so a slow client only
+    # ever holds the latest state instead of stalling the room
+    outbox = OutboundQueue()
+    sender = asyncio.create_task(send_frames(ws, outbox))
+    # Input is read continuously and rate limited; each room tick applies
+    # everything that arrived since the last one. Spectator input is read
+    # (so control frames keep flowing) but never applied.
+    inbox = InputQueue(ready=None if spectate else room.input_ready)
+    reader = asyncio.create_task(read_moves(ws, inbox))
+    room.subscribers.add(outbox)
+    if not spectate:
+        room.players[outbox] = inbox
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({sender, reader}, timeout=STALL_CHECK_INTERVAL,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if done:
+                break
+            if outbox.is_stalled():
+                print(f"Client too slow ({outbox.dropped} frames dropped), disconnecting")
+                metrics.slow_disconnects.inc()
+                await ws.close(1013, "client too slow")
+                break
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        sender.cancel()
+        reader.cancel()
+        leave_room(room, outbox)
+        metrics.active_sessions.dec()
+        print("Client disconnected")
+
+watchdog = LoopWatchdog()
 
 async def websocket_server():
-    async with websockets.serve(handler, "0.0.0.0", 8765):
+    # write_limit keeps the library's own per-connection buffer small; the
+    # OutboundQueue above is what absorbs a slow client. max_size rejects
+    # oversized input frames before they are even read into memory.
+    async with websockets.serve(handler, "0.0.0.0", 8765,
+                                write_limit=64 * 1024, max_size=MAX_MESSAGE_BYTES):
         print("✓ WebSocket server running at ws://0.0.0.0:8765")
-        await asyncio.Future()  # run forever
+        timer_task = asyncio.create_task(timers.run())  # keep a reference so it is not collected
+        await watchdog.heartbeat()  # runs forever
+
+ws_loop_thread_id = None  # thread running the asyncio loop, for the profiler
 
 def run_websocket():
+    global ws_loop_thread_id
+    ws_loop_thread_id = threading.get_ident()
     asyncio.run(websocket_server())
 
 # --- Main Execution ---
@@ -144,6 +459,10 @@ if __name__ == "__main__":
     ws_thread = Thread(target=run_websocket, daemon=True)
     ws_thread.start()
 
+    # Reload edited level files into the cache (new rooms pick them up)
+    if LEVEL_HOT_RELOAD:
+        LevelWatcher().start()
+
     # Give WebSocket time to start
     import time
     time.sleep(1)
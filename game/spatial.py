@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Spatial hash for things that stand on a floor (Roombas, later interactables).
+
+Two indexes kept in step by add/move/remove:
+  - an occupancy dict (x, y) -> object, for "is something on this tile"
+    in one lookup (move_player's collision test);
+  - buckets of CELL x CELL tiles -> set of objects, so a radius query only
+    looks at the few buckets the circle overlaps, however many objects the
+    floor holds.
+
+One object per tile: enemies are solid, so two can never share one.
+
+    python spatial.py     # benchmark occupancy and radius queries as the count grows
+"""
+import random
+import time
+
+CELL = 8    # tiles per bucket side; about a typical query radius
+
+
+class SpatialHash:
+    def __init__(self, cell=CELL):
+        self.cell = cell
+        self.occupied = {}      # (x, y) -> object
+        self.positions = {}     # object -> (x, y)
+        self.buckets = {}       # (x // cell, y // cell) -> set of objects
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(list(self.positions))
+
+    def __contains__(self, obj):
+        return obj in self.positions
+
+    def at(self, x, y):
+        """The object on tile (x, y), or None."""
+        return self.occupied.get((x, y))
+
+    def position(self, obj):
+        return self.positions[obj]
+
+    def add(self, obj, x, y):
+        if (x, y) in self.occupied:
+            raise ValueError(f"tile ({x},{y}) is already occupied")
+        self.occupied[(x, y)] = obj
+        self.positions[obj] = (x, y)
+        self.buckets.setdefault((x // self.cell, y // self.cell), set()).add(obj)
+
+    def remove(self, obj):
+        x, y = self.positions.pop(obj)
+        del self.occupied[(x, y)]
+        key = (x // self.cell, y // self.cell)
+        bucket = self.buckets[key]
+        bucket.discard(obj)
+        if not bucket:
+            del self.buckets[key]
+
+    def move(self, obj, x, y):
+        """Move obj to (x, y). Returns False (and leaves it) if the tile is taken."""
+        old = self.positions[obj]
+        if old == (x, y):
+            return True
+        if (x, y) in self.occupied:
+            return False
+        del self.occupied[old]
+        self.occupied[(x, y)] = obj
+        self.positions[obj] = (x, y)
+        c = self.cell
+        old_key, new_key = (old[0] // c, old[1] // c), (x // c, y // c)
+        if old_key != new_key:
+            bucket = self.buckets[old_key]
+            bucket.discard(obj)
+            if not bucket:
+                del self.buckets[old_key]
+            self.buckets.setdefault(new_key, set()).add(obj)
+        return True
+
+    def near(self, x, y, radius):
+        """Objects within radius tiles (Euclidean) of (x, y)."""
+        c = self.cell
+        r2 = radius * radius
+        found = []
+        for bx in range((x - radius) // c, (x + radius) // c + 1):
+            for by in range((y - radius) // c, (y + radius) // c + 1):
+                bucket = self.buckets.get((bx, by))
+                if not bucket:
+                    continue
+                for obj in bucket:
+                    ox, oy = self.positions[obj]
+                    if (ox - x) * (ox - x) + (oy - y) * (oy - y) <= r2:
+                        found.append(obj)
+        return found
+
+
+def benchmark(counts=(100, 1000, 10000, 100000), size=1000, radius=6, queries=20000, seed=0):
+    rng = random.Random(seed)
+    points = [(rng.randrange(size), rng.randrange(size)) for _ in range(queries)]
+    print(f"{size}x{size} floor, radius {radius}, {queries:,} queries each")
+    for n in counts:
+        index = SpatialHash()
+        cells = rng.sample(range(size * size), n)
+        objs = [object() for _ in range(n)]
+        for obj, cell in zip(objs, cells):
+            index.add(obj, cell % size, cell // size)
+
+        t0 = time.perf_counter()
+        for x, y in points:
+            index.at(x, y)
+        t_at = (time.perf_counter() - t0) / queries
+
+        t0 = time.perf_counter()
+        for x, y in points:
+            index.near(x, y, radius)
+        t_near = (time.perf_counter() - t0) / queries
+
+        t0 = time.perf_counter()
+        for obj in objs[:queries]:
+            x, y = index.position(obj)
+            index.move(obj, min(size - 1, x + 1), y)
+        t_move = (time.perf_counter() - t0) / min(n, queries)
+
+        # What the index replaces: scanning every enemy
+        scan_q = max(1, queries // n)
+        t0 = time.perf_counter()
+        for x, y in points[:scan_q]:
+            [o for o in objs if (index.positions[o][0] - x) ** 2 + (index.positions[o][1] - y) ** 2 <= radius * radius]
+        t_scan = (time.perf_counter() - t0) / scan_q
+
+        print(f"  {n:>7,} objects: at {t_at * 1e6:5.2f} us  near {t_near * 1e6:6.2f} us  "
+              f"move {t_move * 1e6:5.2f} us  (linear scan {t_scan * 1e6:10,.1f} us)")
+
+
+if __name__ == "__main__":
+    benchmark()
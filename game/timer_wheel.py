@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Hierarchical timer wheel for session timers (floor timeouts, night).
+
+Time is counted in ticks of RESOLUTION seconds. Level 0 has one slot per
+tick for the next SLOTS ticks; each level above covers SLOTS times the
+span of the one below. A timer goes into the lowest level whose span
+still reaches its deadline, so scheduling and cancelling are a set add or
+discard. Each tick fires one level-0 slot; when level 0 wraps, the next
+slot of level 1 is redistributed downwards (and so on up the levels), so
+every timer is moved at most once per level.
+
+One driver task (run) serves every session, however many timers are
+pending. Callbacks run on the event loop and must not block.
+
+    python timer_wheel.py     # benchmark with 50,000 timers
+"""
+import asyncio
+import math
+import random
+import time
+
+import metrics
+
+RESOLUTION = 0.1    # seconds per tick
+BITS = 6
+SLOTS = 1 << BITS   # slots per level
+MASK = SLOTS - 1
+LEVELS = 3          # 64 ** 3 ticks = about 7 hours at 0.1 s
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "args", "bucket")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline    # in ticks
+        self.callback = callback
+        self.args = args
+        self.bucket = None          # the slot set holding this timer, None once fired/cancelled
+
+    @property
+    def active(self):
+        return self.bucket is not None
+
+    def cancel(self):
+        if self.bucket is not None:
+            self.bucket.discard(self)
+            self.bucket = None
+            metrics.timers_pending.dec()
+
+
+class TimerWheel:
+    def __init__(self, resolution=RESOLUTION, clock=time.monotonic):
+        self.resolution = resolution
+        self.clock = clock
+        self.origin = clock()
+        self.tick = 0
+        self.wheels = [[set() for _ in range(SLOTS)] for _ in range(LEVELS)]
+
+    def schedule(self, delay, callback, *args):
+        """Call callback(*args) after delay seconds (rounded up to a tick). Returns the Timer."""
+        now = int((self.clock() - self.origin) / self.resolution)
+        ticks = max(1, math.ceil(delay / self.resolution))
+        timer = Timer(max(now, self.tick) + ticks, callback, args)
+        self._place(timer)
+        metrics.timers_pending.inc()
+        return timer
+
+    def _place(self, timer):
+        deadline = timer.deadline
+        for level in range(LEVELS):
+            shift = BITS * (level + 1)
+            # Same slot range as now at the level above: it belongs on this level
+            if deadline >> shift == self.tick >> shift or level == LEVELS - 1:
+                bucket = self.wheels[level][(deadline >> (BITS * level)) & MASK]
+                break
+        bucket.add(timer)
+        timer.bucket = bucket
+
+    def _cascade(self, level):
+        """Move the current slot of level down, after cascading the level above if it wrapped too."""
+        index = (self.tick >> (BITS * level)) & MASK
+        if index == 0 and level + 1 < LEVELS:
+            self._cascade(level + 1)
+        slot = self.wheels[level][index]
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._place(timer)
+
+    def advance(self, now=None):
+        """Fire everything due up to now. Returns the number of callbacks run."""
+        now = self.clock() if now is None else now
+        target = int((now - self.origin) / self.resolution)
+        fired = 0
+        while self.tick < target:
+            self.tick += 1
+            if self.tick & MASK == 0:
+                self._cascade(1)
+            slot = self.wheels[0][self.tick & MASK]
+            if not slot:
+                continue
+            due = [t for t in slot if t.deadline <= self.tick]
+            for timer in due:
+                timer.cancel()
+                fired += 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    print(f"[timer_wheel] {timer.callback.__name__} failed: {e!r}")
+        metrics.timers_fired.inc(fired)
+        return fired
+
+    def __len__(self):
+        return sum(len(slot) for wheel in self.wheels for slot in wheel)
+
+    async def run(self):
+        """Drive the wheel from the event loop (runs forever)."""
+        while True:
+            await asyncio.sleep(self.resolution)
+            self.advance()
+
+
+def benchmark(n=50000):
+    now = [0.0]
+    wheel = TimerWheel(clock=lambda: now[0])
+    rng = random.Random(0)
+    fired = []
+
+    t0 = time.perf_counter()
+    timers = [wheel.schedule(rng.uniform(0, 600), fired.append, i) for i in range(n)]
+    t_schedule = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for timer in timers[::2]:
+        timer.cancel()
+    t_cancel = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    now[0] = 601.0
+    wheel.advance()
+    t_advance = time.perf_counter() - t0
+
+    expected = sorted(range(1, n, 2))
+    ok = sorted(fired) == expected and len(wheel) == 0
+    print(f"{n:,} timers: schedule {t_schedule / n * 1e6:.2f} us, cancel {t_cancel / (n // 2) * 1e6:.2f} us, "
+          f"advance 10 min {t_advance * 1000:.1f} ms ({wheel.tick:,} ticks)  "
+          f"{'✓ fired exactly the uncancelled timers' if ok else '✗ WRONG TIMERS FIRED'}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,194 @@
+# tracing.py
+"""
+Opt-in span tracing and a sampling profiler for the game server.
+
+Spans are recorded into a bounded in-memory buffer and dumped in Chrome
+trace format (open the file in chrome://tracing or https://ui.perfetto.dev).
+The first span opened in a task decides whether that whole trace is
+sampled; nested spans follow the decision, so a sampled handler tick shows
+move_player, load_level, make_grid etc. underneath it.
+
+Tracing is off by default and can be switched on and off at runtime with
+start()/stop(). When it is off, span() returns a shared no-op object.
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+DEFAULT_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0") or 0)
+MAX_EVENTS = 200_000          # oldest spans are dropped beyond this
+PROFILE_INTERVAL = 0.005      # seconds between profiler stack samples
+MIN_PROFILE_INTERVAL = 0.001  # shorter intervals keep a core busy sampling
+
+_enabled = DEFAULT_SAMPLE_RATE > 0
+sample_rate = DEFAULT_SAMPLE_RATE
+_events = deque(maxlen=MAX_EVENTS)
+_epoch = time.perf_counter()
+_pid = os.getpid()
+
+_sampled = contextvars.ContextVar("trace_sampled", default=None)
+_track = contextvars.ContextVar("trace_track", default=None)
+_track_names = {}
+
+
+# ============================================================
+#  SPANS
+# ============================================================
+class _Span:
+    __slots__ = ("name", "args", "record", "root", "start", "token")
+
+    def __init__(self, name, args, record, root):
+        self.name = name
+        self.args = args
+        self.record = record
+        self.root = root
+
+    def __enter__(self):
+        if self.root:
+            self.token = _sampled.set(self.record)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.record:
+            end = time.perf_counter()
+            track = _track.get()
+            _events.append({
+                "name": self.name,
+                "ph": "X",
+                "ts": (self.start - _epoch) * 1e6,
+                "dur": (end - self.start) * 1e6,
+                "pid": _pid,
+                "tid": track if track is not None else threading.get_ident(),
+                "args": self.args,
+            })
+        if self.root:
+            _sampled.reset(self.token)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def span(name, **args):
+    """Context manager recording a span named name, if this trace is sampled."""
+    if not _enabled:
+        return NO_SPAN
+    sampled = _sampled.get()
+    if sampled is None:
+        # first span of a trace: roll the dice once for all its children
+        return _Span(name, args, random.random() < sample_rate, root=True)
+    if not sampled:
+        return NO_SPAN
+    return _Span(name, args, True, root=False)
+
+
+def traced(name=None):
+    """Decorator wrapping each call in a span (named after the function by default)."""
+    def wrap(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def set_track(track_id, name=None):
+    """Put spans from the current task on their own row (e.g. one per client)."""
+    _track.set(track_id)
+    if name:
+        _track_names[track_id] = name
+
+
+# ============================================================
+#  RUNTIME CONTROL
+# ============================================================
+def start(rate=None):
+    global _enabled, sample_rate
+    if rate is not None:
+        sample_rate = max(0.0, min(1.0, float(rate)))
+    if sample_rate <= 0:
+        sample_rate = 1.0
+    _enabled = True
+
+
+def stop():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    _events.clear()
+
+
+def status():
+    return {"enabled": _enabled, "sample_rate": sample_rate, "events": len(_events)}
+
+
+def dump(path):
+    """Write buffered spans to path in Chrome trace format; returns the span count."""
+    events = list(_events)
+    meta = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": n}}
+            for tid, n in list(_track_names.items())]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+# ============================================================
+#  SAMPLING PROFILER
+# ============================================================
+class SamplingProfiler(threading.Thread):
+    """
+    Samples one thread's Python stack every interval seconds and counts
+    identical stacks. folded() returns them in the collapsed format that
+    flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True, name="sampling-profiler")
+        self.thread_id = thread_id
+        self.interval = max(MIN_PROFILE_INTERVAL, interval)  # also catches NaN
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
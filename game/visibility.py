@@ -0,0 +1,104 @@
+# visibility.py
+"""
+Field of view and fog of war.
+
+compute_fov() is recursive shadowcasting: each of the eight octants around
+the player is scanned row by row outwards, and every opaque tile narrows
+(or splits) the range of slopes still lit beyond it. Each tile is looked at
+most once, so a radius-6 view costs a few hundred grid reads.
+
+The server only sends what the player can see: a window covering the
+visible tiles, with None for tiles inside the window that are hidden.
+FovCache keeps those windows per (position, radius) for one session. It is
+cleared when the session's grid object changes (a new floor) or its door
+version changes (doors opening in place).
+"""
+import tracing
+
+OPAQUE = {"#", "="}     # walls and closed doors block sight
+DAY_RADIUS = 6          # tiles; roughly the old client-side light circle
+NIGHT_RADIUS = 3        # while GS.night is set
+MAX_CACHED = 4096       # windows kept per session before starting over
+
+# (xx, xy, yx, yy) transforms mapping octant 0 onto each of the eight octants
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+
+def compute_fov(grid, w, h, origin, radius):
+    """Set of (x, y) visible from origin within radius, walls included."""
+    ox, oy = origin
+    visible = {(ox, oy)}
+    r2 = radius * radius
+
+    def opaque(x, y):
+        return not (0 <= x < w and 0 <= y < h) or grid[y][x][:1] in OPAQUE
+
+    def cast(row, start, end, xx, xy, yx, yy):
+        if start < end:
+            return
+        new_start = start
+        for j in range(row, radius + 1):
+            dy = -j
+            blocked = False
+            for dx in range(-j, 1):
+                l_slope = (dx - 0.5) / (dy + 0.5)
+                r_slope = (dx + 0.5) / (dy - 0.5)
+                if start < r_slope:
+                    continue
+                if end > l_slope:
+                    break
+                x = ox + dx * xx + dy * xy
+                y = oy + dx * yx + dy * yy
+                if dx * dx + dy * dy <= r2 and 0 <= x < w and 0 <= y < h:
+                    visible.add((x, y))
+                if blocked:
+                    if opaque(x, y):
+                        new_start = r_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque(x, y) and j < radius:
+                    blocked = True
+                    cast(j + 1, start, l_slope, xx, xy, yx, yy)
+                    new_start = r_slope
+            if blocked:
+                break
+
+    for octant in OCTANTS:
+        cast(1, 1.0, 0.0, *octant)
+    return visible
+
+
+def visible_window(grid, w, h, origin, radius):
+    """
+    (x0, y0, rows): the bounding box of what is visible from origin, with
+    hidden tiles inside it set to None.
+    """
+    visible = compute_fov(grid, w, h, origin, radius)
+    xs = [x for x, _ in visible]
+    ys = [y for _, y in visible]
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    rows = [[grid[y][x] if (x, y) in visible else None for x in range(x0, x1 + 1)]
+            for y in range(y0, y1 + 1)]
+    return x0, y0, rows
+
+
+class FovCache:
+    def __init__(self):
+        self.windows = {}
+        self.grid = None
+        self.version = None
+
+    def window(self, grid, w, h, origin, radius, version):
+        """visible_window(), reused while grid and version stay the same."""
+        if grid is not self.grid or version != self.version or len(self.windows) >= MAX_CACHED:
+            self.windows.clear()
+            self.grid = grid
+            self.version = version
+        key = (tuple(origin), radius)
+        hit = self.windows.get(key)
+        if hit is None:
+            with tracing.span("fov", radius=radius):
+                hit = self.windows[key] = visible_window(grid, w, h, key[0], radius)
+        return hit
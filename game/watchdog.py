@@ -0,0 +1,66 @@
+# watchdog.py
+"""
+Event-loop lag watchdog.
+
+A heartbeat task inside the asyncio loop records how late each of its
+wakeups is (the loop lag metric). A monitor thread outside the loop checks
+that the heartbeat keeps moving; when it stalls for longer than the
+threshold, the monitor grabs the loop thread's current stack, which shows
+exactly which call is blocking every client, and logs it once per stall.
+The stall is counted through the loop (call_soon_threadsafe), since
+metrics are only ever updated on the loop thread.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+
+HEARTBEAT_INTERVAL = 0.05   # seconds between heartbeats
+LAG_THRESHOLD = float(os.environ.get("LOOP_LAG_THRESHOLD", "0.1"))  # seconds before a stall is reported
+
+
+class LoopWatchdog:
+    def __init__(self, threshold=LAG_THRESHOLD, interval=HEARTBEAT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop_thread_id = None
+        self.loop = None
+        self.last_beat = time.monotonic()
+        self.stalls = 0
+        self._monitor = None
+
+    async def heartbeat(self):
+        """Run inside the event loop forever, recording loop lag."""
+        self.loop_thread_id = threading.get_ident()
+        self.loop = asyncio.get_running_loop()
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._watch, daemon=True, name="loop-watchdog")
+            self._monitor.start()
+        while True:
+            start = time.perf_counter()
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            metrics.loop_lag.observe(max(0.0, time.perf_counter() - start - self.interval))
+
+    def _watch(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.interval)
+            beat = self.last_beat
+            stalled_for = time.monotonic() - beat
+            if stalled_for > self.threshold + self.interval and beat != reported_beat:
+                reported_beat = beat  # one report per stall
+                self.stalls += 1
+                # lands once the loop is free again
+                self.loop.call_soon_threadsafe(metrics.loop_stalls.inc)
+                self._report(stalled_for)
+
+    def _report(self, stalled_for):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "  (no stack available)\n"
+        print(f"[watchdog] event loop blocked for {stalled_for * 1000:.0f} ms, currently in:\n{stack}",
+              end="", flush=True)
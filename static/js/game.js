@@ -13,6 +13,8 @@
     // Local or standard deployment
     WS_URL = `ws://${window.location.hostname}:8765`;
   }
+  // Pass ?room=<name>[&spectate=1] through so players can share a game or watch one
+  WS_URL += '/' + window.location.search;
   
   console.log('Connecting to WebSocket:', WS_URL);
 
@@ -63,14 +65,9 @@
   // Disable image smoothing for crisp pixel art
   ctx.imageSmoothingEnabled = false;
   ctx.webkitImageSmoothingEnabled = false;
-    
-  // Create an off-screen canvas for drawing the dim overlay
-  const overlayCanvas = document.createElement('canvas');
-  overlayCanvas.width = canvas.width;
-  overlayCanvas.height = canvas.height;
-  const overlayCtx = overlayCanvas.getContext('2d');
-  overlayCtx.setTransform(dpr, 0, 0, dpr, 0, 0);
-  overlayCtx.imageSmoothingEnabled = false;
+
+  // Fog of war: tiles seen before but not visible now are drawn dimmed
+  const REMEMBERED_DIM = 'rgba(0, 0, 0, 0.65)';
 
   // Image cache to avoid reloading
   const imageCache = {};
@@ -112,10 +109,31 @@
   const timerInterval = setInterval(updateTimer, 100);
 
   // last known server state
-  let lastGrid = null;
+  let knownGrid = null;     // every tile seen on this floor (null = never seen)
+  let knownFloor = null;
+  let knownByFloor = {};    // floor -> its knownGrid, so going back to a floor is a swap
+  let visibleTiles = null;  // Set of "x,y" the player can see right now
+  let lastState = null;
   let lastPlayer = null;
   let serverTiles = null;
 
+  // Client-side prediction: moves are drawn as soon as the key is pressed,
+  // replayed on top of the last server position until the server acks them.
+  // The server stays authoritative: a frame always resets the prediction.
+  const MOVE_OFFSETS = { w: [0, -1], s: [0, 1], a: [-1, 0], d: [1, 0] };
+  // Stay just under the server's rate limit (inbound.py) so it never drops a predicted move
+  const MOVE_RATE = 15;     // moves per second
+  const MOVE_BURST = 4;
+  let moveTokens = MOVE_BURST;
+  let lastRefill = performance.now();
+  let seq = 0;              // sequence number of the last move sent
+  let pending = [];         // {seq, move} sent but not yet acknowledged
+  let predicting = false;   // the server acks our moves (spectators get no acks)
+  let frameAck = null;      // ack received for the frame that comes next
+  // Tiles the prediction leaves to the server: doors, keys, stairs, enemies
+  const STOP_TILES = new Set(['=', '<', '^', 'v', 'E']);
+  let renderQueued = false;
+
   // Display a message to the player
   function showMessage(text) {
     if (!text) return;
@@ -182,12 +200,75 @@
   }
 
 
-  function draw(state) {
-    const grid = state.grid;
-    const player = state.player;
-    if (!Array.isArray(grid) || grid.length === 0) return;
+  // Merge the visible window the server sent into the remembered floor map
+  function updateKnown(state) {
+    const view = state.view;
+    if (!view || !Array.isArray(state.grid)) return false;
+    if (knownFloor !== state.floor) {
+      knownGrid = knownByFloor[state.floor] || null;
+      knownFloor = state.floor;
+    }
+    if (!knownGrid || knownGrid.length !== view.h || knownGrid[0].length !== view.w) {
+      knownGrid = Array.from({ length: view.h }, () => new Array(view.w).fill(null));
+      knownByFloor[state.floor] = knownGrid;
+    }
+    visibleTiles = new Set();
+    state.grid.forEach((row, dy) => {
+      row.forEach((cell, dx) => {
+        if (cell === null) return;
+        knownGrid[view.y + dy][view.x + dx] = cell;
+        visibleTiles.add((view.x + dx) + ',' + (view.y + dy));
+      });
+    });
+    return true;
+  }
+
+  function takeMoveToken() {
+    const now = performance.now();
+    moveTokens = Math.min(MOVE_BURST, moveTokens + (now - lastRefill) / 1000 * MOVE_RATE);
+    lastRefill = now;
+    if (moveTokens < 1) return false;
+    moveTokens -= 1;
+    return true;
+  }
+
+  // Server position with the unacknowledged moves replayed on top, using
+  // only tiles this client has seen. Walls and the map edge block as they
+  // do on the server; a door, key, stair, enemy or unseen tile stops the
+  // replay until the server has resolved it.
+  function predictedPlayer() {
+    const base = lastState.player;
+    if (!predicting || !knownGrid || !base) return base;
+    let x = base.x;
+    let y = base.y;
+    for (const p of pending) {
+      const [dx, dy] = MOVE_OFFSETS[p.move];
+      const row = knownGrid[y + dy];
+      const cell = row ? row[x + dx] : undefined;
+      if (cell === undefined) continue;  // off the map
+      const c = typeof cell === 'string' && cell ? cell[0] : ' ';
+      if (cell === null || STOP_TILES.has(c)) break;
+      if (c === '#') continue;
+      x += dx;
+      y += dy;
+    }
+    return { x, y };
+  }
+
+  // Draw at most once per animation frame, whether woken by input or by the server
+  function scheduleRender() {
+    if (renderQueued) return;
+    renderQueued = true;
+    requestAnimationFrame(() => {
+      renderQueued = false;
+      if (lastState) draw(predictedPlayer());
+    });
+  }
+
+  function draw(player) {
+    const grid = knownGrid;
+    if (!grid) return;
 
-    lastGrid = grid;
     lastPlayer = player;
 
     const gridRows = grid.length;
@@ -217,6 +298,8 @@
     // Draw tiles
     for (let y = startRow; y < endRow; y++) {
       for (let x = startCol; x < endCol; x++) {
+        // Never seen: leave it black
+        if (grid[y][x] === null) continue;
         const cell = String(grid[y][x] || ' ');
         const key = cell[0];
         
@@ -239,13 +322,14 @@
           ctx.fillStyle = '#555';
           ctx.fillRect(screenX, screenY, TILE_SIZE, TILE_SIZE);
         }
+
+        // Seen before but out of sight now
+        if (!visibleTiles.has(x + ',' + y)) {
+          ctx.fillStyle = REMEMBERED_DIM;
+          ctx.fillRect(screenX, screenY, TILE_SIZE, TILE_SIZE);
+        }
       }
     }
-    // RANDOM VISION SHRINKING TRIGGER
-    let randomNumber = Math.floor(Math.random() * 1800) + 1;
-
-  // Check if the number is the specific success value (e.g., 800)
-
 
     // draw player sprite centered on screen
     if (player && Number.isFinite(player.x) && Number.isFinite(player.y)) {
@@ -278,54 +362,30 @@
       // Restore canvas state
       ctx.restore();
     }
-
-    // Draw dim overlay and vision cone using off-screen canvas
-    if (player && Number.isFinite(player.x) && Number.isFinite(player.y)) {
-      const playerScreenX = (player.x - cameraX + 0.5) * TILE_SIZE;
-      const playerScreenY = (player.y - cameraY + 0.5) * TILE_SIZE;
-      const visionRadius = 350; // how far the light reaches
-      const visionAngle = 360; // degrees (360° = full circle)
-      const visionDirection = 0;
-
-      // Convert to radians and calculate start/end angles
-      const startAngle = (visionDirection - visionAngle / 2) * (Math.PI / 180);
-      const endAngle = (visionDirection + visionAngle / 2) * (Math.PI / 180);
-
-      // Clear overlay canvas
-      overlayCtx.clearRect(0, 0, VIEWPORT_WIDTH, VIEWPORT_HEIGHT);
-
-      // Draw on overlay canvas: fill with dim, then cut out the vision cone
-      overlayCtx.fillStyle = 'rgba(0, 0, 0, 1)';
-      overlayCtx.fillRect(0, 0, VIEWPORT_WIDTH, VIEWPORT_HEIGHT);
-
-      // Cut out the vision cone (use destination-out to erase)
-      overlayCtx.globalCompositeOperation = 'destination-out';
-      overlayCtx.fillStyle = 'rgba(0, 0, 0, 1)';
-      overlayCtx.beginPath();
-      overlayCtx.arc(playerScreenX, playerScreenY, visionRadius, startAngle, endAngle);
-      overlayCtx.lineTo(playerScreenX, playerScreenY);
-      overlayCtx.closePath();
-      overlayCtx.fill();
-
-      // Reset composite operation
-      overlayCtx.globalCompositeOperation = 'source-over';
-
-      // Draw the overlay canvas onto the main canvas
-      ctx.drawImage(overlayCanvas, 0, 0, VIEWPORT_WIDTH, VIEWPORT_HEIGHT);
-    } else {
-      // If no player, just dim everything
-      ctx.fillStyle = 'rgba(0, 0, 0, 0.9)';
-      ctx.fillRect(0, 0, VIEWPORT_WIDTH, VIEWPORT_HEIGHT);
-    }
   }
 
   // reconnecting websocket with simple backoff
   function connect() {
     ws = new WebSocket(WS_URL);
-    ws.addEventListener('open', () => console.log('WS open', WS_URL));
+    ws.addEventListener('open', () => {
+      console.log('WS open', WS_URL);
+      // A new connection starts a new sequence on the server
+      seq = 0;
+      pending = [];
+      predicting = false;
+      frameAck = null;
+      // and may be a new game
+      knownByFloor = {};
+      knownFloor = null;
+    });
     ws.addEventListener('message', (evt) => {
       try {
         const state = JSON.parse(evt.data);
+        // An ack is sent on its own just before the frame it belongs to
+        if (typeof state.ack === 'number') {
+          frameAck = state.ack;
+          return;
+        }
         // server may send `basic_tiles` mapping; store it
         if (state.basic_tiles) {
           serverTiles = state.basic_tiles;
@@ -344,7 +404,15 @@
           window.location.href = 'end.html';
           return;
         }
-        draw(state);
+        if (frameAck !== null) {
+          // Everything up to the ack is already in this frame's position
+          predicting = true;
+          pending = pending.filter((p) => p.seq > frameAck);
+          frameAck = null;
+        }
+        if (!updateKnown(state)) return;
+        lastState = state;
+        scheduleRender();
       } catch (err) {
         console.error('Failed to parse state', err, evt.data);
       }
@@ -357,40 +425,44 @@
       console.error('WS error', e);
       ws.close();
     });
+  }
 
-    // forward keyboard input and update player direction
-    window.addEventListener('keyup', (ev) => {
-      // Stop footstep audio when key is released
-      footstepAudio.pause(); 
-      footstepAudio.currentTime = 0;
-    });
+  // forward keyboard input and update player direction (registered once, not per connection)
+  window.addEventListener('keyup', (ev) => {
+    // Stop footstep audio when key is released
+    footstepAudio.pause(); 
+    footstepAudio.currentTime = 0;
+  });
+  
+  window.addEventListener('keydown', (ev) => {
+    // Don't send movement commands if paused
+    if (isPaused) return;
     
-    window.addEventListener('keydown', (ev) => {
-      // Don't send movement commands if paused
-      if (isPaused) return;
-      
-      const keyMap = { 
-        ArrowUp: 'w', ArrowLeft: 'a', ArrowDown: 's', ArrowRight: 'd', 
-        w: 'w', a: 'a', s: 's', d: 'd' 
-      };
-      const mv = keyMap[ev.key];
-      
-      // Update player direction based on key pressed
-      if (ev.key === 'w' || ev.key === 'ArrowUp') playerDirection = 0;      // up
-      else if (ev.key === 'd' || ev.key === 'ArrowRight') playerDirection = 90;  // right
-      else if (ev.key === 's' || ev.key === 'ArrowDown') playerDirection = 180;  // down
-      else if (ev.key === 'a' || ev.key === 'ArrowLeft') playerDirection = 270;  // left
+    const keyMap = { 
+      ArrowUp: 'w', ArrowLeft: 'a', ArrowDown: 's', ArrowRight: 'd', 
+      w: 'w', a: 'a', s: 's', d: 'd' 
+    };
+    const mv = keyMap[ev.key];
+    
+    // Update player direction based on key pressed
+    if (ev.key === 'w' || ev.key === 'ArrowUp') playerDirection = 0;      // up
+    else if (ev.key === 'd' || ev.key === 'ArrowRight') playerDirection = 90;  // right
+    else if (ev.key === 's' || ev.key === 'ArrowDown') playerDirection = 180;  // down
+    else if (ev.key === 'a' || ev.key === 'ArrowLeft') playerDirection = 270;  // left
+    
+    if (mv) {
+      // Play footstep audio
+      footstepAudio.play();
       
-      if (mv) {
-        // Play footstep audio
-        footstepAudio.play();
-        
-        if (ws.readyState === WebSocket.OPEN) {
-          ws.send(JSON.stringify({ move: mv }));
-        }
+      if (ws && ws.readyState === WebSocket.OPEN && takeMoveToken()) {
+        seq += 1;
+        ws.send(JSON.stringify({ move: mv, seq }));
+        if (predicting) pending.push({ seq, move: mv });
       }
-    });
-  }
+      // Draw the turn (and the predicted step) this frame, not after the round trip
+      scheduleRender();
+    }
+  });
 
   // prevent page scrolling and set margins
   document.documentElement.style.overflow = 'hidden';